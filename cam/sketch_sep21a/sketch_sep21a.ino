@@ -1,5 +1,5 @@
 /*
- *  ESP32-CAM 红外触发 → 每 10s 拍照 → POST 到 Flask /detect
+ *  ESP32-CAM 红外触发 → 每 10s 拍照 → POST JPEG 原始字节到 Flask /detect
  *  检测到猫：SetFaucet(TURN_ON)（开饮水机）→ 继续循环
  *  未检测到猫：SetFaucet(TURN_OFF)（关饮水机）→ 退出循环
  *  硬件：
@@ -10,7 +10,6 @@
 #include "esp_camera.h"
 #include <WiFi.h>
 #include <HTTPClient.h>
-#include <base64.h>
 #include <ArduinoOTA.h>
 
 #include "wifi_config.h"
@@ -268,7 +267,25 @@ void setup() {
   Serial.println("Setup complete - System ready with dim LED");
 }
 
-// 拍照 → base64 → POST JSON → 解析结果（包含亮度检测）
+// Percent-encode a message so it can travel in an HTTP header (X-Message)
+String urlEncode(const String& value) {
+  const char* hex = "0123456789ABCDEF";
+  String encoded;
+  encoded.reserve(value.length() * 3);
+  for (size_t i = 0; i < value.length(); i++) {
+    uint8_t c = (uint8_t)value[i];
+    if (isalnum(c) || c == '-' || c == '_' || c == '.' || c == '~' || c == ' ' || c == ',' || c == '=') {
+      encoded += (char)c;
+    } else {
+      encoded += '%';
+      encoded += hex[c >> 4];
+      encoded += hex[c & 0x0F];
+    }
+  }
+  return encoded;
+}
+
+// 拍照 → POST image/jpeg 原始字节（消息放在 X-Message 头）→ 解析结果（包含亮度检测）
 // 返回检测结果：CAT_DETECTED, IMAGE_TOO_DARK, NO_CAT, ERROR
 DetectionResult detectCat(const char* userMessage = "") {
   Serial.println("Starting detection");
@@ -307,26 +324,21 @@ DetectionResult detectCat(const char* userMessage = "") {
   
   Serial.printf("Captured image: %dx%d, %d bytes\n", fb->width, fb->height, fb->len);
   
-  String b64 = base64::encode(fb->buf, fb->len);
-  esp_camera_fb_return(fb);
-
   HTTPClient http;
   http.setTimeout(10000);  // 10 second timeout
   http.begin(serverUrl);
-  http.addHeader("Content-Type", "application/json");
+  // Send the JPEG as-is: no base64 copy in RAM and ~33% less WiFi airtime
+  http.addHeader("Content-Type", "image/jpeg");
   
   // Include message in the request
-  String body = "{\"image\":\"" + b64 + "\"";
   if (message.length() > 0) {
-    // Escape quotes in message for JSON
-    String escapedMessage = message;
-    escapedMessage.replace("\"", "\\\"");
-    body += ",\"message\":\"" + escapedMessage + "\"";
+    http.addHeader("X-Message", urlEncode(message));
   }
-  body += "}";
   
   Serial.println("Sending request to server...");
-  int code = http.POST(body);
+  int code = http.POST(fb->buf, fb->len);
+  // Frame buffer must stay valid until the body has been sent
+  esp_camera_fb_return(fb);
   DetectionResult result = NO_CAT;
   if (code == 200) {
     String payload = http.getString();
@@ -1,157 +1,157 @@
+import atexit
 import os
-import base64
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from flask import Flask, request, jsonify, render_template, render_template_string, url_for
+from typing import Optional, Tuple
+from urllib.parse import unquote
+from flask import Flask, request, jsonify, render_template, url_for
 import requests
 import database as db
 from dotenv import load_dotenv
-from detection import paddle_has_cat_from_b64 as paddle_has_cat
-import cv2
-import numpy as np
-from xiaomi_thermo import XiaomiThermoService
+from inference import classify as paddle_has_cat, shutdown as stop_inference, warm_up
+from frame import Frame, is_image_too_dark, thumbnail_path
+from scene_cache import SceneChangeCache, compute_signature
+from retention import RetentionJob, RetentionPolicy
+from storage import ImageStore
+from writer import PersistenceWriter, PersistJob
+from xiaomi_thermo import get_poller as get_thermo_poller
 
 load_dotenv()  # Load environment variables from .env file
 
 STATIC_DIR = Path(__file__).parent / "static"
 STATIC_DIR.mkdir(parents=True, exist_ok=True)
 app = Flask(__name__, static_folder=str(STATIC_DIR), static_url_path='/static')
+# Stored images and thumbnails never change once written: let browsers cache them
+# (Flask's static handler adds an ETag and answers If-None-Match with 304)
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = int(os.getenv("STATIC_MAX_AGE", "86400"))
 
-# Global counter for incremental image IDs
-_image_counter = 0
-
-# Global brightness detection toggle
-_brightness_detection_enabled = True
-
-def initialize_image_counter():
-    """Initialize the image counter based on existing files"""
-    global _image_counter
-    max_id = 0
-    if STATIC_DIR.exists():
-        for file_path in STATIC_DIR.glob("*.jpg"):
-            try:
-                # Extract numeric ID from filename (e.g., "000001.jpg" -> 1)
-                file_id = int(file_path.stem)
-                max_id = max(max_id, file_id)
-            except ValueError:
-                # Skip files that don't match the numeric pattern
-                continue
-    if max_id >= (100000 - 1):
-        max_id = 0
-    _image_counter = max_id
-
-def get_next_image_id():
-    """Get the next incremental image ID"""
-    global _image_counter
-    _image_counter += 1
-    return _image_counter
-
-# Initialize counter on startup
-initialize_image_counter()
-
-def resize_image_if_needed(image_bytes: bytes, max_size: int = 640) -> bytes:
-    """
-    Resize image to at most max_size in the largest dimension while keeping aspect ratio.
-    Image is already flipped by ESP32, so no additional flipping needed.
-    Returns the resized image as bytes.
-    """
-    try:
-        # Decode image from bytes
-        nparr = np.frombuffer(image_bytes, dtype=np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if img is None:
-            return image_bytes  # Return original if decode fails
-        
-        height, width = img.shape[:2]
-        
-        # Calculate new dimensions
-        if max(height, width) <= max_size:
-            # No resize needed, just encode the image
-            _, encoded_img = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 85])
-            return encoded_img.tobytes()
-        
-        # Calculate scale factor
-        scale = max_size / max(height, width)
-        new_width = int(width * scale)
-        new_height = int(height * scale)
-        
-        # Resize image
-        resized_img = cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_AREA)
-        
-        # Encode back to bytes
-        _, encoded_img = cv2.imencode('.jpg', resized_img, [cv2.IMWRITE_JPEG_QUALITY, 85])
-        return encoded_img.tobytes()
-        
-    except Exception:
-        # Return original image if resize fails
-        return image_bytes
-
-from typing import Tuple
-
-def calculate_image_brightness(image_bytes: bytes) -> float:
+# How stored frames are encoded: original (pass-through when no resize is needed),
+# recompressed (JPEG quality 85) or webp
+STORAGE_POLICY = os.getenv("IMAGE_STORAGE_POLICY", "original").strip().lower()
+
+# Date-sharded image files (static/YYYY/MM/DD/); the log table stores paths relative to STATIC_DIR
+image_store = ImageStore(STATIC_DIR, app.static_url_path)
+
+# Background writer for detection images and log rows
+image_writer = PersistenceWriter(
+    image_store,
+    max_queue=int(os.getenv("WRITER_QUEUE_SIZE", "256")),
+    max_batch=int(os.getenv("WRITER_BATCH_SIZE", "32")),
+)
+atexit.register(image_writer.stop)  # flush pending writes on shutdown
+
+# Background cleanup of old records and images
+retention_job = RetentionJob(RetentionPolicy.from_env(), image_store)
+
+# Per-camera cache of the last classified scene, skips inference for unchanged frames
+_scene_cache_enabled = os.getenv("SCENE_CACHE_ENABLED", "1") != "0"
+scene_cache = SceneChangeCache.from_env()
+
+# Largest page /api/detections and /log return
+MAX_PAGE_SIZE = 200
+
+def brightness_detection_enabled() -> bool:
+    """亮度检测开关，存在 SQLite 里，多进程部署时所有 worker 看到同一个值"""
+    return db.get_setting("brightness_detection", "1") == "1"
+
+def save_detection(frame: Frame, cat: bool, message: str, too_dark: bool = False,
+                   camera: Optional[str] = None):
     """
-    Calculate the average brightness of an image.
-    Returns a value between 0-255 where 0 is completely dark and 255 is completely bright.
+    存图并落库 - 使用递增序列ID，按日期分目录 (static/YYYY/MM/DD/)
+    Encoding, the thumbnail, the file write and the log insert all happen in the
+    background writer, so the response waits for none of them. The frame must not
+    be used after this call.
     """
-    try:
-        # Decode image from bytes
-        nparr = np.frombuffer(image_bytes, dtype=np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if img is None:
-            return 0.0
-        
-        # Convert to grayscale for brightness calculation
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Calculate mean brightness
-        brightness = np.mean(gray)
-        
-        return float(brightness)
-        
-    except Exception as e:
-        print(f"Error calculating brightness: {e}")
-        return 0.0
+    image_writer.submit(PersistJob(
+        frame=frame,
+        cat=cat,
+        message=message,
+        ts=datetime.now().isoformat(),
+        too_dark=too_dark,
+        camera=camera,
+        policy=STORAGE_POLICY,
+    ))
+
+RAW_IMAGE_MIMETYPES = ("image/jpeg", "application/octet-stream")
 
-def is_image_too_dark(brightness: float, threshold: float = 30.0) -> bool:
+def read_detect_upload() -> Tuple[Optional[bytes], Optional[str], str]:
     """
-    Determine if an image is too dark based on brightness threshold.
-    Default threshold is 30 (0-255 scale).
+    Read the image and optional ESP32 message from a /detect request.
+    Supports three body modes:
+      - image/jpeg (or application/octet-stream): raw JPEG bytes, message in the X-Message header (URL-encoded)
+      - multipart/form-data: file field "image", form field "message"
+      - JSON {image: base64, message: string}
+    Returns (raw image bytes, base64 image, message); exactly one of the first two is set
+    when an image is present.
     """
-    return brightness < threshold
+    if request.mimetype in RAW_IMAGE_MIMETYPES:
+        image_bytes = request.get_data(cache=False)
+        message = unquote(request.headers.get("X-Message", ""))
+        return (image_bytes or None), None, message
+
+    if request.mimetype == "multipart/form-data":
+        upload = request.files.get("image")
+        image_bytes = upload.read() if upload else None
+        return (image_bytes or None), None, request.form.get("message", "")
+
+    data = request.get_json(force=True, silent=True)
+    if not data or "image" not in data:
+        return None, None, ""
+    return None, data["image"], data.get("message", "")
+
+def camera_id_from_request() -> str:
+    """Camera identity: X-Camera-Id header or ?camera= query parameter, else the client address."""
+    return (
+        request.headers.get("X-Camera-Id")
+        or request.args.get("camera")
+        or request.remote_addr
+        or "unknown"
+    )
+
+def classify_frame(frame: Frame, camera: str) -> Tuple[bool, str]:
+    """Run the classifier unless the camera's scene is unchanged since its last classified frame."""
+    img = frame.image
+    if not _scene_cache_enabled or img is None:
+        return paddle_has_cat(img)
+    signature = compute_signature(img)
+    cached = scene_cache.lookup(camera, signature)
+    if cached is not None:
+        print(f"[{camera}] Scene unchanged - reusing previous verdict cat={cached[0]}")
+        return cached
+    verdict = paddle_has_cat(img)
+    scene_cache.update(camera, signature, verdict)
+    return verdict
 
 @app.route("/detect", methods=["POST"])
 def detect():
     """
-    接收 JSON {image: base64, message: string (optional)}
+    接收 image/jpeg 原始字节（X-Message 头）、multipart/form-data（image, message）
+    或 JSON {image: base64, message: string (optional)}
     返回 JSON {cat: true/false, too_dark: true/false, brightness: float}
     并落库
     """
-    data = request.get_json(force=True)
-    if not data or "image" not in data:
+    image_bytes, b64_image, esp32_message = read_detect_upload()
+    if image_bytes is None and b64_image is None:
         return jsonify({"cat": False, "too_dark": False, "error": "missing image"}), 400
-    b64 = data["image"]
-    esp32_message = data.get("message", "")  # Get message from ESP32 if provided
+    
+    camera = camera_id_from_request()
     
     # Display message if provided
     if esp32_message:
         print(f"[ESP32] Message: {esp32_message}")
     
-    # 调整图片尺寸 - 最大尺寸320像素，保持宽高比
+    # 只解码一次：缩放（最大尺寸320像素，保持宽高比）、亮度、检测和存图共用同一帧
     try:
-        image_bytes = base64.b64decode(b64)
-        resized_bytes = resize_image_if_needed(image_bytes, max_size=320)
-        # 将调整后的图片重新编码为base64用于检测
-        resized_b64 = base64.b64encode(resized_bytes).decode('utf-8')
+        if image_bytes is not None:
+            frame = Frame(image_bytes, max_size=320)
+        else:
+            frame = Frame.from_b64(b64_image, max_size=320)
     except Exception as e:
-        resized_b64 = b64  # 如果调整失败，使用原图
-        resized_bytes = base64.b64decode(b64)
-    
-    # 计算图片亮度
-    brightness = calculate_image_brightness(resized_bytes)
+        return jsonify({"cat": False, "too_dark": False, "error": f"invalid image: {e}"}), 400
     
-    # 根据全局设置决定是否检测亮度
-    if _brightness_detection_enabled:
+    # 根据全局设置决定是否检测亮度（先用低分辨率亮度估计，暗图无需完整解码）
+    if brightness_detection_enabled():
+        brightness = frame.brightness()
         too_dark = is_image_too_dark(brightness)
     else:
         too_dark = False  # 禁用亮度检测时，始终返回最大亮度
@@ -164,24 +164,16 @@ def detect():
             print(f"{error_msg} - {esp32_message} - skipping cat detection")
         else:
             print(f"{error_msg} - skipping cat detection")
-        # 存图 - 使用递增序列ID
-        img_id = get_next_image_id()
-        img_name = f"{img_id:06d}.jpg"  # 6位数字，如 000001.jpg, 000002.jpg
-        img_path = STATIC_DIR / img_name
-        try:
-            with open(img_path, "wb") as f:
-                f.write(resized_bytes)
-        except Exception as e:
-            err = str(e)
         # Build message: append ESP32 message to error message
         message = error_msg
         if esp32_message:
             message += " | " + esp32_message
-        db.insert_record(str(app.static_url_path + "/" + img_name), False, message)
+        # 暗图按存储策略保存；默认 original 直接保存原始字节，不做解码/缩放/重新编码
+        save_detection(frame, False, message, too_dark=True, camera=camera)
         return jsonify({"cat": False, "too_dark": True, "brightness": brightness})
     
-    # 使用调整后的图片进行检测
-    cat, err = paddle_has_cat(resized_b64)
+    # 使用解码后的图片直接检测；同一摄像头画面几乎没变时复用上次结果
+    cat, err = classify_frame(frame, camera)
     
     # Always display detection result
     if esp32_message:
@@ -189,16 +181,6 @@ def detect():
     else:
         print(f"[ESP32] Detection result: cat={cat}")
     
-    # 存图 - 使用递增序列ID
-    img_id = get_next_image_id()
-    img_name = f"{img_id:06d}.jpg"  # 6位数字，如 000001.jpg, 000002.jpg
-    img_path = STATIC_DIR / img_name
-    try:
-        with open(img_path, "wb") as f:
-            f.write(resized_bytes)
-    except Exception as e:
-        err = str(e)
-    
     # Build message: start with error (if any), then append ESP32 message
     message = err if err else ""
     if esp32_message:
@@ -207,144 +189,113 @@ def detect():
         else:
             message = esp32_message
     
-    db.insert_record(str(app.static_url_path + "/" + img_name), cat, message)
+    save_detection(frame, cat, message, camera=camera)
     return jsonify({"cat": cat, "too_dark": False, "brightness": brightness})
 
 @app.route("/toggle_brightness", methods=["POST"])
 def toggle_brightness():
     """Toggle brightness detection on/off"""
-    global _brightness_detection_enabled
     data = request.get_json(force=True)
     if "enabled" in data:
-        _brightness_detection_enabled = bool(data["enabled"])
-        print(f"Brightness detection {'enabled' if _brightness_detection_enabled else 'disabled'}")
-        return jsonify({"success": True, "enabled": _brightness_detection_enabled})
+        enabled = bool(data["enabled"])
+        db.set_setting("brightness_detection", "1" if enabled else "0")
+        print(f"Brightness detection {'enabled' if enabled else 'disabled'}")
+        return jsonify({"success": True, "enabled": enabled})
     return jsonify({"success": False, "error": "missing enabled parameter"}), 400
 
 @app.route("/brightness_status")
 def brightness_status():
     """Get current brightness detection status"""
-    global _brightness_detection_enabled
-    return jsonify({"enabled": _brightness_detection_enabled})
+    return jsonify({"enabled": brightness_detection_enabled()})
 
-@app.route("/log")
-def log():
+@app.route("/stats")
+def stats():
+    """Runtime counters for tuning (scene cache hit/miss, writer queue depth, retention, thermometer poller)"""
+    return jsonify({
+        "scene_cache": dict(scene_cache.stats(), enabled=_scene_cache_enabled),
+        "writer": image_writer.stats(),
+        "retention": retention_job.stats(),
+        "thermometers": get_thermo_poller().stats(),
+    })
+
+def _flag_arg(name: str) -> Optional[bool]:
+    value = request.args.get(name, "").strip().lower()
+    if not value:
+        return None
+    return value in ("1", "true", "yes", "on")
+
+def _int_arg(name: str, default: Optional[int]) -> Optional[int]:
+    try:
+        return int(request.args[name])
+    except (KeyError, ValueError):
+        return default
+
+def detection_query() -> dict:
+    """Filters shared by /api/detections and /log (ts bounds are ISO strings, e.g. 2025-01-31)."""
+    return {
+        "cat": _flag_arg("cat"),
+        "too_dark": _flag_arg("too_dark"),
+        "camera": request.args.get("camera") or None,
+        "since": request.args.get("since") or None,
+        "until": request.args.get("until") or None,
+    }
+
+def _exclusive_until(until: Optional[str]) -> Optional[str]:
+    """A bare date (the /log date picker) includes that whole day: 2025-01-31 -> 2025-02-01."""
+    if until and len(until) == 10:
+        try:
+            return (date.fromisoformat(until) + timedelta(days=1)).isoformat()
+        except ValueError:
+            pass
+    return until
+
+def query_detections(limit: int, before_id: Optional[int], filters: dict) -> Tuple[list, Optional[int]]:
     """
-    查看最近 10 次调用记录，并清理更旧的记录与文件
+    One page of log rows, newest first. Keyset pagination on id: the returned cursor
+    is passed back as ?before= and is None on the last page.
     """
-    # Clean DB and FS: keep only last 10
-    try:
-        deleted = db.delete_older_records_keep_latest(limit=10)
-        for item in deleted:
-            try:
-                p = Path(item["image_path"]) if item.get("image_path") else None
-                if p and p.exists():
-                    p.unlink(missing_ok=True)
-            except Exception:
-                pass
-    except Exception:
-        # Ignore cleanup errors for log page availability
-        deleted = []
-
-    rows = db.get_recent_logs(limit=10)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    filters = dict(filters, until=_exclusive_until(filters.get("until")))
+    rows = db.query_logs(limit=limit, before_id=before_id, **filters)
     for r in rows:
-        r['image_path'] = r['image_path'].replace('\\\\', '/').replace('\\', '/')
-    # 简单表格展示，包含亮度检测开关
-    html = """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>猫检测记录</title>
-        <meta charset="utf-8">
-        <style>
-            body { font-family: Arial, sans-serif; margin: 20px; }
-            .toggle-container { margin: 20px 0; padding: 15px; background: #f0f0f0; border-radius: 5px; }
-            .toggle-switch { position: relative; display: inline-block; width: 60px; height: 34px; }
-            .toggle-switch input { opacity: 0; width: 0; height: 0; }
-            .slider { position: absolute; cursor: pointer; top: 0; left: 0; right: 0; bottom: 0; background-color: #ccc; transition: .4s; border-radius: 34px; }
-            .slider:before { position: absolute; content: ""; height: 26px; width: 26px; left: 4px; bottom: 4px; background-color: white; transition: .4s; border-radius: 50%; }
-            input:checked + .slider { background-color: #2196F3; }
-            input:checked + .slider:before { transform: translateX(26px); }
-            table { border-collapse: collapse; width: 100%; margin-top: 20px; }
-            th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
-            th { background-color: #f2f2f2; }
-            img { max-width: 200px; height: auto; }
-        </style>
-    </head>
-    <body>
-        <h2>猫检测系统控制面板</h2>
-        
-        <div class="toggle-container">
-            <h3>亮度检测控制</h3>
-            <label class="toggle-switch">
-                <input type="checkbox" id="brightnessToggle" onchange="toggleBrightness()">
-                <span class="slider"></span>
-            </label>
-            <span id="toggleStatus">亮度检测: 启用</span>
-        </div>
-        
-        <h3>最近 10 次检测记录（已自动清理旧记录）</h3>
-        <table>
-            <tr><th>时间</th><th>图片</th><th>有猫</th><th>消息</th></tr>
-            {% for r in rows %}
-            <tr>
-                <td>{{ r.ts }}</td>
-                <td><img src="{{ r.image_path }}" width="200"></td>
-                <td>{{ "✔" if r.cat else "✘" }}</td>
-                <td>{{ r.error or "-" }}</td>
-            </tr>
-            {% endfor %}
-        </table>
-        
-        <script>
-            // 页面加载时获取当前状态
-            window.onload = function() {
-                fetch('/brightness_status')
-                    .then(response => response.json())
-                    .then(data => {
-                        document.getElementById('brightnessToggle').checked = data.enabled;
-                        updateStatusText(data.enabled);
-                    })
-                    .catch(error => console.error('Error:', error));
-            };
-            
-            function toggleBrightness() {
-                const toggle = document.getElementById('brightnessToggle');
-                const enabled = toggle.checked;
-                
-                fetch('/toggle_brightness', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify({enabled: enabled})
-                })
-                .then(response => response.json())
-                .then(data => {
-                    if (data.success) {
-                        updateStatusText(data.enabled);
-                        console.log('Brightness detection ' + (data.enabled ? 'enabled' : 'disabled'));
-                    } else {
-                        console.error('Failed to toggle brightness detection');
-                        toggle.checked = !enabled; // 恢复原状态
-                    }
-                })
-                .catch(error => {
-                    console.error('Error:', error);
-                    toggle.checked = !enabled; // 恢复原状态
-                });
-            }
-            
-            function updateStatusText(enabled) {
-                const statusText = document.getElementById('toggleStatus');
-                statusText.textContent = '亮度检测: ' + (enabled ? '启用' : '禁用');
-                statusText.style.color = enabled ? 'green' : 'red';
-            }
-        </script>
-    </body>
-    </html>
+        r['image_path'] = image_store.url_for(r['image_path'])
+        # Records from before thumbnails existed fall back to the full image
+        thumb_url = thumbnail_path(r['image_path'])
+        thumb_file = image_store.path_for(thumb_url)
+        r['thumb_url'] = thumb_url if thumb_file is not None and thumb_file.exists() else None
+    next_before = rows[-1]["id"] if len(rows) == limit else None
+    return rows, next_before
+
+@app.route("/api/detections")
+def detections_api():
+    """
+    检测记录 JSON 接口
+    参数: limit, before (上一页返回的 next_before), cat, too_dark, camera, since, until
     """
-    return render_template_string(html, rows=rows)
+    filters = detection_query()
+    rows, next_before = query_detections(
+        _int_arg("limit", 50), _int_arg("before", None), filters
+    )
+    return jsonify({"items": rows, "next_before": next_before})
+
+@app.route("/log")
+def log():
+    """
+    查看检测记录（只读；旧记录由后台保留策略清理），支持与 /api/detections 相同的分页和筛选参数
+    """
+    filters = detection_query()
+    rows, next_before = query_detections(
+        _int_arg("limit", 10), _int_arg("before", None), filters
+    )
+    # 翻页链接保留当前的筛选条件
+    filter_args = {
+        key: request.args[key]
+        for key in ("limit", "cat", "too_dark", "camera", "since", "until")
+        if request.args.get(key)
+    }
+    return render_template(
+        "log.html", rows=rows, next_before=next_before, filters=filters, filter_args=filter_args
+    )
 
 
 @app.route("/thermometers")
@@ -371,10 +322,16 @@ def thermometer_data():
             "items": mock_items,
         })
 
-    service = XiaomiThermoService.from_env()
-    try:
-        return jsonify(service.get_house_readings())
-    except ValueError as exc:
+    # 后台线程定期刷新，这里直接返回最近一次的快照；刷新失败时继续返回旧数据并标记 stale
+    poller = get_thermo_poller()
+    snapshot, exc = poller.get()
+    if snapshot is not None:
+        payload = snapshot.to_dict()
+        payload["stale"] = poller.is_stale(snapshot)
+        if exc is not None:
+            payload["error"] = "Failed to refresh data from Xiaomi cloud, showing last readings."
+        return jsonify(payload)
+    if isinstance(exc, ValueError):
         return (
             jsonify(
                 {
@@ -386,19 +343,46 @@ def thermometer_data():
             ),
             400,
         )
-    except Exception as exc:
-        print(f"Failed to load thermometer data from Xiaomi cloud: {exc}")
-        return (
-            jsonify(
-                {
-                    "count": 0,
-                    "updated_at": None,
-                    "items": [],
-                    "error": "Failed to load data from Xiaomi cloud.",
-                }
-            ),
-            502,
-        )
+    return (
+        jsonify(
+            {
+                "count": 0,
+                "updated_at": None,
+                "items": [],
+                "error": "Failed to load data from Xiaomi cloud.",
+            }
+        ),
+        502,
+    )
+
+def warm_up_model():
+    """Load the classifier before serving so the first /detect after boot does not stall."""
+    try:
+        elapsed = warm_up()
+        print(f"Model warm-up finished in {elapsed:.2f}s")
+    except Exception as e:
+        print(f"Model warm-up failed: {e}")
+
+def start_background_jobs():
+    """Start periodic background work (record / image retention). Run it in one process only."""
+    retention_job.start()
+    atexit.register(retention_job.stop)
+
+def shutdown():
+    """
+    Graceful shutdown: stop background jobs and the inference executors, flush
+    images / log rows still queued, close the database.
+    """
+    retention_job.stop()
+    get_thermo_poller().stop()
+    stop_inference()
+    image_writer.stop()
+    db.close_all()
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8099, debug=False)
\ No newline at end of file
+    warm_up_model()
+    start_background_jobs()
+    try:
+        app.run(host="0.0.0.0", port=8099, debug=False)
+    finally:
+        shutdown()
\ No newline at end of file
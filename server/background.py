@@ -0,0 +1,85 @@
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+_STOP = object()  # queued by stop(), after everything submitted before it
+
+
+class BackgroundWorker:
+    """
+    A daemon thread fed through a queue, shared by the write-behind writer, the
+    batch inference worker and the thermometer poller. The thread is started
+    lazily, once per process (a forked child starts its own instead of relying on
+    its parent's), and stop() queues a sentinel behind the pending items and joins
+    the thread with a timeout.
+    """
+
+    def __init__(self, name: str, target: Callable[[], None], max_queue: int = 0):
+        self.name = name
+        self.target = target
+        self.max_queue = max_queue
+        self.queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self) -> None:
+        # Started lazily so the thread belongs to the process that serves requests
+        with self._lock:
+            if self._pid != os.getpid():
+                self.queue = queue.Queue(maxsize=self.max_queue)  # the parent's items stay there
+                self._thread = None
+                self._pid = os.getpid()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self.target, name=self.name, daemon=True)
+                self._thread.start()
+
+    def is_running(self) -> bool:
+        thread = self._thread
+        return thread is not None and self._pid == os.getpid() and thread.is_alive()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Let the thread finish the items queued so far, then wait up to timeout for it."""
+        with self._lock:
+            thread = self._thread if self._pid == os.getpid() else None
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self.queue.put(_STOP)
+            thread.join(timeout)
+
+    def next_batch(self, max_batch: int, max_wait: float = 0.0) -> Tuple[List[Any], bool]:
+        """
+        Called by the thread: block for one item, then collect more for up to
+        max_wait seconds (0 = only those already queued) or until max_batch.
+        Returns the items and whether the thread should exit after handling them.
+        """
+        item = self.queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + max_wait
+        while len(batch) < max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def wait(self, timeout: float) -> bool:
+        """Called by the thread: sleep up to timeout. Returns True when it should exit."""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                if self.queue.get(timeout=remaining) is _STOP:
+                    return True
+            except queue.Empty:
+                return False
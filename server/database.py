@@ -1,65 +1,262 @@
+import os
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Tuple
 
 DB_FILE = "detect.db"
 Path(DB_FILE).touch()
 
-def get_conn():
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+# Small pool of connections shared by the threads of a process: every call checks
+# one out and returns it, instead of reopening the file for every statement. When
+# all are in use an extra one is opened and closed again on return.
+POOL_SIZE = max(1, int(os.getenv("DB_POOL_SIZE", "4")))
+_pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=POOL_SIZE)
+_pool_pid = os.getpid()
+_pool_lock = threading.Lock()
+# Connections opened before a fork belong to the parent; the child keeps them
+# referenced (never closes or uses them) so SQLite's file locks are not disturbed
+_inherited: List[sqlite3.Connection] = []
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False, timeout=30, cached_statements=128)
     conn.row_factory = sqlite3.Row
+    # WAL lets dashboard reads run alongside camera inserts; NORMAL skips the fsync per commit
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
     return conn
 
+def _current_pool() -> "queue.LifoQueue[sqlite3.Connection]":
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool_pid != os.getpid():
+            while True:
+                try:
+                    _inherited.append(_pool.get_nowait())
+                except queue.Empty:
+                    break
+            _pool = queue.LifoQueue(maxsize=POOL_SIZE)
+            _pool_pid = os.getpid()
+        return _pool
+
+@contextmanager
+def connection() -> Iterator[sqlite3.Connection]:
+    """Check a connection out of the pool for the duration of the block."""
+    pool = _current_pool()
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = _connect()
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        if pool is not _current_pool():
+            conn.close()
+        else:
+            try:
+                pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+def close_all():
+    """Close the pooled connections (on shutdown); new ones are opened on next use."""
+    pool = _current_pool()
+    while True:
+        try:
+            pool.get_nowait().close()
+        except queue.Empty:
+            return
+
+def _ensure_column(conn, name: str, decl: str):
+    """Add a column to an existing log table created by an older version."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(log)")}
+    if name not in columns:
+        conn.execute(f"ALTER TABLE log ADD COLUMN {name} {decl}")
+
 def init_db():
-    conn = get_conn()
-    conn.execute(
-        """CREATE TABLE IF NOT EXISTS log(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ts TEXT,
-            image_path TEXT,
-            cat INTEGER,
-            error TEXT)"""
-    )
-    conn.commit()
-    conn.close()
-
-def insert_record(image_path: str, cat: bool, error: str = None):
-    conn = get_conn()
-    conn.execute("INSERT INTO log(ts, image_path, cat, error) VALUES (?,?,?,?)",
-                 (datetime.now().isoformat(), image_path, int(cat), error))
-    conn.commit()
-    conn.close()
+    with connection() as conn, conn:  # checked out, then one transaction
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS log(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts TEXT,
+                image_path TEXT,
+                cat INTEGER,
+                error TEXT)"""
+        )
+        _ensure_column(conn, "image_size", "INTEGER DEFAULT 0")
+        _ensure_column(conn, "too_dark", "INTEGER DEFAULT 0")
+        _ensure_column(conn, "camera", "TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_log_ts ON log(ts)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_log_cat ON log(cat, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_log_too_dark ON log(too_dark, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_log_camera ON log(camera, id)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters(name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS settings(name TEXT PRIMARY KEY, value TEXT)")
+
+def get_setting(name: str, default: Optional[str] = None) -> Optional[str]:
+    """Runtime setting shared by every worker process (e.g. toggles changed from /log)."""
+    with connection() as conn:
+        row = conn.execute("SELECT value FROM settings WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else default
+
+def set_setting(name: str, value: str):
+    with connection() as conn, conn:
+        conn.execute(
+            "INSERT INTO settings(name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+            (name, value),
+        )
+
+def reserve_counter_block(name: str, size: int) -> int:
+    """
+    Advance a named counter by `size` and return the first value of the reserved
+    block (first .. first + size - 1). BEGIN IMMEDIATE takes the write lock up front,
+    so threads and worker processes never get overlapping blocks, and the value
+    survives restarts.
+    """
+    with connection() as conn, conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT OR IGNORE INTO counters(name, value) VALUES (?, 0)", (name,))
+        conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (size, name))
+        end = conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+        return end - size + 1
+
+def next_counter(name: str) -> int:
+    """Increment a named counter and return the new value."""
+    return reserve_counter_block(name, 1)
+
+class LogRecord(NamedTuple):
+    ts: str
+    image_path: str
+    cat: bool
+    error: Optional[str] = None
+    image_size: int = 0
+    too_dark: bool = False
+    camera: Optional[str] = None
+
+def insert_record(image_path: str, cat: bool, error: str = None, image_size: int = 0,
+                  too_dark: bool = False, camera: str = None):
+    insert_records([LogRecord(datetime.now().isoformat(), image_path, cat, error,
+                              image_size, too_dark, camera)])
+
+def insert_records(records: List[LogRecord]):
+    """Insert several rows in one transaction."""
+    if not records:
+        return
+    with connection() as conn, conn:
+        conn.executemany(
+            "INSERT INTO log(ts, image_path, cat, error, image_size, too_dark, camera) VALUES (?,?,?,?,?,?,?)",
+            [(r.ts, r.image_path, int(r.cat), r.error, r.image_size, int(r.too_dark), r.camera)
+             for r in records])
 
 def get_recent_logs(limit=20):
-    conn = get_conn()
-    rows = conn.execute(
-        "SELECT * FROM log ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
-    conn.close()
+    with connection() as conn:
+        rows = conn.execute(
+            "SELECT * FROM log ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
     return [dict(r) for r in rows]
 
+def query_logs(limit: int = 50, before_id: int = None, cat: bool = None, too_dark: bool = None,
+               camera: str = None, since: str = None, until: str = None) -> List[dict]:
+    """
+    One page of records, newest first. Keyset pagination: pass the smallest id of
+    the previous page as before_id. since/until are ISO timestamps (inclusive / exclusive).
+    """
+    clauses = []
+    params: list = []
+    if before_id is not None:
+        clauses.append("id < ?")
+        params.append(before_id)
+    if cat is not None:
+        clauses.append("cat = ?")
+        params.append(int(cat))
+    if too_dark is not None:
+        clauses.append("too_dark = ?")
+        params.append(int(too_dark))
+    if camera:
+        clauses.append("camera = ?")
+        params.append(camera)
+    if since:
+        clauses.append("ts >= ?")
+        params.append(since)
+    if until:
+        clauses.append("ts < ?")
+        params.append(until)
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    params.append(limit)
+    with connection() as conn:
+        rows = conn.execute(
+            f"SELECT * FROM log {where} ORDER BY id DESC LIMIT ?", params).fetchall()
+    return [dict(r) for r in rows]
+
+def id_boundary_keep_latest(limit: int) -> Optional[int]:
+    """Id of the `limit`-th newest record; older rows have smaller ids. None if there are fewer rows."""
+    if limit <= 0:
+        return None
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT id FROM log ORDER BY id DESC LIMIT 1 OFFSET ?", (limit - 1,)
+        ).fetchone()
+    return row[0] if row else None
+
+def id_boundary_since(ts: str) -> Optional[int]:
+    """Smallest id recorded at or after `ts` (ISO format); every row below it is older."""
+    with connection() as conn:
+        row = conn.execute("SELECT MIN(id) FROM log WHERE ts >= ?", (ts,)).fetchone()
+        if row[0] is not None:
+            return row[0]
+        row = conn.execute("SELECT MAX(id) FROM log").fetchone()
+    return row[0] + 1 if row[0] is not None else None
+
+def id_boundary_disk_budget(max_bytes: int) -> Optional[int]:
+    """Smallest id such that the rows from it upward fit in `max_bytes` of images."""
+    with connection() as conn:
+        row = conn.execute(
+            """SELECT id FROM (
+                   SELECT id, SUM(image_size) OVER (ORDER BY id DESC) AS total FROM log
+               ) WHERE total > ? ORDER BY id DESC LIMIT 1""",
+            (max_bytes,),
+        ).fetchone()
+    return row[0] + 1 if row else None
+
+def delete_records_before(boundary_id: int, keep_positives_since: str = None) -> List[dict]:
+    """
+    Delete every record with id < boundary_id in one range delete, optionally sparing
+    cat detections recorded at or after `keep_positives_since`.
+    Returns the deleted rows (id, image_path) so their files can be removed.
+    """
+    where = "id < ?"
+    params: Tuple = (boundary_id,)
+    if keep_positives_since:
+        where += " AND NOT (cat = 1 AND ts >= ?)"
+        params += (keep_positives_since,)
+    with connection() as conn, conn:
+        rows = conn.execute(f"SELECT id, image_path FROM log WHERE {where}", params).fetchall()
+        if rows:
+            conn.execute(f"DELETE FROM log WHERE {where}", params)
+    return [{"id": r[0], "image_path": r[1]} for r in rows]
+
+def has_records_between(since: str, until: str) -> bool:
+    """Whether any record has since <= ts < until (uses idx_log_ts)."""
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM log WHERE ts >= ? AND ts < ? LIMIT 1", (since, until)
+        ).fetchone()
+    return row is not None
+
+def oldest_ts() -> Optional[str]:
+    with connection() as conn:
+        return conn.execute("SELECT MIN(ts) FROM log").fetchone()[0]
+
 def delete_older_records_keep_latest(limit=10):
     """Delete records older than the latest `limit`, return deleted rows as dicts."""
-    conn = get_conn()
-    # Identify IDs to keep
-    keep_rows = conn.execute(
-        "SELECT id FROM log ORDER BY id DESC LIMIT ?", (limit,)
-    ).fetchall()
-    keep_ids = {r[0] for r in keep_rows}
-
-    # Collect rows to delete (id, image_path)
-    del_rows = conn.execute(
-        "SELECT id, image_path FROM log WHERE id NOT IN (" + ",".join(["?"] * len(keep_ids)) + ")",
-        tuple(keep_ids) if keep_ids else tuple()
-    ).fetchall() if keep_ids else []
-
-    if del_rows:
-        del_ids = [r[0] for r in del_rows]
-        conn.execute(
-            "DELETE FROM log WHERE id IN (" + ",".join(["?"] * len(del_ids)) + ")",
-            tuple(del_ids)
-        )
-        conn.commit()
-    conn.close()
-    return [{"id": r[0], "image_path": r[1]} for r in del_rows]
+    boundary = id_boundary_keep_latest(limit)
+    return delete_records_before(boundary) if boundary is not None else []
 
 init_db()
\ No newline at end of file
@@ -1,39 +1,330 @@
 import os
 import base64
-from typing import Tuple
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import numpy as np
 import cv2
 
-_paddle_clas_model = None
+DEFAULT_MODEL_NAME = "EfficientNetB0"
 
+# paddle: PaddleClas model zoo; opencv: exported ONNX classifier run through cv2.dnn
+DETECTION_ENGINES = ("paddle", "opencv")
 
-def _get_paddle_clas(model_name=None):
-    """Lazy init and return PaddleClas classifier instance."""
-    global _paddle_clas_model
-    if _paddle_clas_model is None or model_name is not None:
+# fp32: float model; fp16: float model run with the FP16 CPU target; int8: post-training
+# quantized model. Reduced precision is only used if the accuracy gate accepted it.
+DETECTION_PRECISIONS = ("fp32", "fp16", "int8")
+
+# ImageNet preprocessing used by PaddleClas models (RGB order)
+IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+# Loaded engines keyed by "engine:model", least recently used first
+_model_cache: "OrderedDict[str, object]" = OrderedDict()
+_model_cache_lock = threading.Lock()
+
+
+def detection_engine() -> str:
+    engine = os.getenv("DETECTION_ENGINE", "paddle").strip().lower()
+    return engine if engine in DETECTION_ENGINES else "paddle"
+
+
+def detection_precision() -> str:
+    precision = os.getenv("DETECTION_PRECISION", "fp32").strip().lower()
+    return precision if precision in DETECTION_PRECISIONS else "fp32"
+
+
+def quantized_model_path(model_path: str) -> str:
+    """Where the INT8 model calibrated from model_path lives (model.onnx -> model.int8.onnx)."""
+    root, _ = os.path.splitext(model_path)
+    return root + ".int8.onnx"
+
+
+def quantization_gate_path(model_path: str) -> str:
+    """Accuracy gate written by test/quantize_test.py (model.onnx -> model.quant.json)."""
+    root, _ = os.path.splitext(model_path)
+    return root + ".quant.json"
+
+
+def model_digest(path: str) -> Optional[str]:
+    """sha256 of a model file, used to tie the accuracy gate to the models it evaluated."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def read_quantization_gate(model_path: str) -> dict:
+    """
+    Load the accuracy gate for model_path. A gate recorded for a different model file
+    (replaced or re-exported since quantize_test.py ran) is ignored.
+    """
+    try:
+        with open(quantization_gate_path(model_path), encoding="utf-8") as f:
+            gate = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(gate, dict):
+        return {}
+    if gate.get("model_sha256") != model_digest(model_path):
+        print(f"Accuracy gate {quantization_gate_path(model_path)} was written for a different "
+              f"model file, ignoring it")
+        return {}
+    return gate
+
+
+def resolve_precision(model_path: str, precision: str) -> str:
+    """
+    Return the precision to actually run: reduced precision only when the accuracy
+    gate for this model accepted it, otherwise fall back to fp32.
+    """
+    if precision == "fp32":
+        return precision
+    gate = read_quantization_gate(model_path)
+    entry = gate.get(precision)
+    if not isinstance(entry, dict) or not entry.get("accepted"):
+        print(f"{precision} not accepted by accuracy gate for {model_path}, using fp32 "
+              f"(run test/quantize_test.py to calibrate and evaluate it)")
+        return "fp32"
+    if precision == "int8":
+        int8_path = quantized_model_path(model_path)
+        if not os.path.exists(int8_path):
+            print(f"Quantized model {int8_path} missing, using fp32")
+            return "fp32"
+        if entry.get("sha256") != model_digest(int8_path):
+            print(f"Quantized model {int8_path} changed since it was evaluated, using fp32")
+            return "fp32"
+    return precision
+
+
+def _default_model_name() -> str:
+    if detection_engine() == "opencv":
+        return os.getenv("DETECTION_ONNX_MODEL", "")
+    return os.getenv("PADDLECLAS_MODEL_NAME", DEFAULT_MODEL_NAME)
+
+
+def _max_resident_models() -> int:
+    """How many classifiers may stay loaded at once (PADDLECLAS_MAX_MODELS, default 2)."""
+    try:
+        return max(1, int(os.getenv("PADDLECLAS_MAX_MODELS", "2")))
+    except ValueError:
+        return 2
+
+
+def _topk() -> int:
+    """Number of top classes returned per image (PADDLECLAS_TOPK, default 5)."""
+    try:
+        return max(1, int(os.getenv("PADDLECLAS_TOPK", "5")))
+    except ValueError:
+        return 5
+
+
+def _load_label_list(path: str) -> List[str]:
+    """Read a label list, one class per line, optionally prefixed by its id ("0 tench")."""
+    labels = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            head, _, rest = line.partition(" ")
+            labels.append(rest.strip() if head.isdigit() and rest else line)
+    return labels
+
+
+class PaddleEngine:
+    """PaddleClas model zoo classifier."""
+
+    def __init__(self, model_name: str):
         try:
             from paddleclas import PaddleClas
         except Exception as e:
             raise RuntimeError(f"Failed to import PaddleClas: {e}")
-        # Use provided model_name or environment variable or default
-        if model_name is None:
-            model_name = os.getenv("PADDLECLAS_MODEL_NAME", "EfficientNetB0")
-        _paddle_clas_model = PaddleClas(model_name=model_name, topk=5, use_gpu=False)
-    return _paddle_clas_model
+        self.classifier = PaddleClas(model_name=model_name, topk=_topk(), use_gpu=False)
+        self._lock = threading.Lock()  # the Paddle predictor must not run concurrently
+
+    def predict_batch(self, images: List[np.ndarray]) -> List[dict]:
+        # PaddleClas.predict() only takes a single array; its predictor stacks a list into one batch
+        predictor = getattr(self.classifier, "predictor", None)
+        with self._lock:
+            if predictor is not None:
+                return list(predictor.predict(list(images)))
+            return [_first_result(list(self.classifier.predict(img))) for img in images]
+
+
+def _center_crop(img: np.ndarray, input_size: int) -> np.ndarray:
+    # Resize short side to 256/224 of the input size, then center crop (PaddleClas eval transform)
+    height, width = img.shape[:2]
+    short = int(round(input_size * 256 / 224))
+    scale = short / min(height, width)
+    img = cv2.resize(img, (max(1, round(width * scale)), max(1, round(height * scale))),
+                     interpolation=cv2.INTER_LINEAR)
+    height, width = img.shape[:2]
+    top = (height - input_size) // 2
+    left = (width - input_size) // 2
+    return img[top:top + input_size, left:left + input_size]
+
+
+def imagenet_blob(images: List[np.ndarray], input_size: int = 224) -> np.ndarray:
+    """NCHW float32 RGB blob normalized with ImageNet mean/std, from BGR images."""
+    crops = [_center_crop(img, input_size) for img in images]
+    blob = cv2.dnn.blobFromImages(crops, scalefactor=1.0 / 255, swapRB=True, crop=False)
+    return (blob - IMAGENET_MEAN[None, :, None, None]) / IMAGENET_STD[None, :, None, None]
+
+
+class OpenCVDnnEngine:
+    """
+    Exported ONNX ImageNet classifier run through cv2.dnn, without importing Paddle.
+    Produces PaddleClas-shaped results: {"class_ids", "scores", "label_names"}.
+    """
+
+    def __init__(self, model_path: str, input_size: int = 224, labels_path: str = None,
+                 precision: str = "fp32"):
+        if not model_path or not os.path.exists(model_path):
+            raise RuntimeError(f"ONNX model not found: {model_path!r} (set DETECTION_ONNX_MODEL)")
+        self.precision = precision
+        self.net = cv2.dnn.readNet(quantized_model_path(model_path) if precision == "int8" else model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        target = cv2.dnn.DNN_TARGET_CPU
+        if precision == "fp16":
+            # Only available in newer OpenCV builds
+            target = getattr(cv2.dnn, "DNN_TARGET_CPU_FP16", target)
+        self.net.setPreferableTarget(target)
+        self.input_size = input_size
+        self.labels = _load_label_list(labels_path) if labels_path else []
+        self._lock = threading.Lock()  # a cv2.dnn.Net must not run concurrently
+
+    def predict_batch(self, images: List[np.ndarray]) -> List[dict]:
+        blob = imagenet_blob(images, self.input_size)
+        with self._lock:
+            self.net.setInput(blob)
+            output = self.net.forward()
+        output = output.reshape(len(images), -1)
+        # Apply softmax unless the exported graph already ends in one
+        if output.min() < 0 or not np.allclose(output.sum(axis=1), 1.0, atol=1e-3):
+            output = np.exp(output - output.max(axis=1, keepdims=True))
+            output /= output.sum(axis=1, keepdims=True)
+
+        k = min(_topk(), output.shape[1])
+        results = []
+        for probs in output:
+            top = np.argsort(probs)[::-1][:k]
+            results.append({
+                "class_ids": top.tolist(),
+                "scores": [round(float(probs[i]), 5) for i in top],
+                "label_names": [self.labels[i] if i < len(self.labels) else "" for i in top],
+            })
+        return results
+
+
+def _create_engine(engine: str, model_name: str):
+    if engine == "opencv":
+        return OpenCVDnnEngine(
+            model_name,
+            labels_path=os.getenv("DETECTION_LABELS_FILE"),
+            precision=resolve_precision(model_name, detection_precision()),
+        )
+    if detection_precision() != "fp32":
+        print("DETECTION_PRECISION only applies to the opencv engine, using fp32")
+    return PaddleEngine(model_name)
+
+
+def _cache_key(model_name: str) -> str:
+    engine = detection_engine()
+    if engine == "opencv":
+        return f"{engine}:{model_name}:{detection_precision()}"
+    return f"{engine}:{model_name}"
+
+
+def _get_classifier(model_name=None):
+    """Return the configured engine for model_name, loading it once and keeping it in the LRU model cache."""
+    engine = detection_engine()
+    if model_name is None:
+        model_name = _default_model_name()
+    key = _cache_key(model_name)
+    with _model_cache_lock:
+        classifier = _model_cache.get(key)
+        if classifier is not None:
+            _model_cache.move_to_end(key)
+            return classifier
+
+        classifier = _create_engine(engine, model_name)
+        _model_cache[key] = classifier
+        while len(_model_cache) > _max_resident_models():
+            evicted_key, _ = _model_cache.popitem(last=False)
+            print(f"Evicted model {evicted_key} from cache")
+        return classifier
+
+
+def evict_model(model_name: str = None) -> bool:
+    """Drop a loaded classifier from the cache. Returns True if it was resident."""
+    if model_name is None:
+        model_name = _default_model_name()
+    with _model_cache_lock:
+        return _model_cache.pop(_cache_key(model_name), None) is not None
+
+
+def clear_model_cache() -> None:
+    with _model_cache_lock:
+        _model_cache.clear()
+
+
+def loaded_models() -> List[str]:
+    """Keys ("engine:model[:precision]") of resident classifiers, least recently used first."""
+    with _model_cache_lock:
+        return list(_model_cache.keys())
+
+
+def warm_up(model_name: str = None) -> float:
+    """
+    Load the classifier and run one dummy prediction so the first real request
+    does not pay model load and graph initialization. Returns elapsed seconds.
+    """
+    start = time.time()
+    _get_classifier(model_name).predict_batch([np.zeros((224, 224, 3), dtype=np.uint8)])
+    return time.time() - start
+
+
+def paddle_has_cat_from_array(img: np.ndarray, model_name: str = None) -> Tuple[bool, str]:
+    """Classify an already decoded BGR image with the configured engine."""
+    if img is None:
+        return False, "failed to decode image"
+    try:
+        results = _get_classifier(model_name).predict_batch([img])
+        has_cat = _labels_has_cat(results)
+        return has_cat, ""
+    except Exception as e:
+        return False, str(e)
+
+
+def engine_has_cat(engine, img: np.ndarray) -> bool:
+    """Classify with an explicit engine instance, bypassing the model cache (used by benchmarks)."""
+    return _labels_has_cat(engine.predict_batch([img]))
+
+
+def paddle_has_cat_batch(images: List[np.ndarray], model_name: str = None) -> List[Tuple[bool, str]]:
+    """
+    Classify several decoded BGR images with one forward pass.
+    Returns one (has_cat, error) tuple per input image, in order.
+    """
+    if len(images) < 2:
+        return [paddle_has_cat_from_array(img, model_name) for img in images]
+    batch_results = _get_classifier(model_name).predict_batch(images)
+    return [(_labels_has_cat([result]), "") for result in batch_results]
 
 
 def paddle_has_cat_from_bytes(image_bytes: bytes, model_name: str = None) -> Tuple[bool, str]:
     try:
         nparr = np.frombuffer(image_bytes, dtype=np.uint8)
         img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        if img is None:
-            return False, "failed to decode image"
-
-        classifier = _get_paddle_clas(model_name)
-        results = classifier.predict(img)
-        has_cat = _labels_has_cat(results)
-        return has_cat, ""
+        return paddle_has_cat_from_array(img, model_name)
     except Exception as e:
         return False, str(e)
 
@@ -46,45 +337,168 @@ def paddle_has_cat_from_b64(b64_image: str, model_name: str = None) -> Tuple[boo
         return False, str(e)
 
 
+CAT_KEYWORDS = (
+    "cat", "kitten", "tomcat", "tabby", "tiger cat", "siamese", "persian",
+    "egyptian cat", "lynx", "wildcat", "feline", "domestic cat", "house cat",
+    "maine coon", "british shorthair", "ragdoll", "munchkin", "scottish fold",
+    "bengal cat", "russian blue", "abyssinian", "birman", "oriental shorthair"
+)
+
+# 添加其他毛茸茸动物关键词，这些也会被识别为猫
+FURRY_ANIMAL_KEYWORDS = (
+    "dog", "puppy", "puppies", "canine", "hound", "terrier", "retriever",
+    "shepherd", "spaniel", "poodle", "bulldog", "beagle", "chihuahua",
+    "rabbit", "bunny", "hare", "hamster", "guinea pig", "gerbil",
+    "ferret", "weasel", "mink", "otter", "raccoon", "raccoon dog",
+    "fox", "red fox", "arctic fox", "wolf", "coyote", "jackal",
+    "bear", "panda", "koala", "squirrel", "chipmunk", "marmot",
+    "hedgehog", "porcupine", "skunk", "badger", "wolverine",
+    "seal", "sea lion", "walrus", "otter", "beaver", "muskrat",
+    "chinchilla", "capybara", "lemur", "monkey", "ape", "gorilla",
+    "furry", "fluffy", "hairy", "fuzzy", "woolly", "downy"
+)
+
+
+def load_keywords(path: str = None) -> Tuple[str, ...]:
+    """
+    Keywords that make a label count as cat-like. Read from CAT_KEYWORDS_FILE
+    (one keyword per line, '#' starts a comment) when set, else the built-in table.
+    """
+    path = path or os.getenv("CAT_KEYWORDS_FILE")
+    if not path:
+        return CAT_KEYWORDS + FURRY_ANIMAL_KEYWORDS
+    keywords = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            keyword = line.split("#", 1)[0].strip().lower()
+            if keyword:
+                keywords.append(keyword)
+    return tuple(keywords)
+
+
+def compile_keyword_pattern(keywords: Iterable[str]) -> "re.Pattern":
+    """One alternation regex for all keywords (substring match, like the old `k in label` scan)."""
+    unique = sorted({k.lower() for k in keywords if k}, key=len, reverse=True)
+    if not unique:
+        return re.compile(r"(?!x)x")  # matches nothing
+    return re.compile("|".join(re.escape(k) for k in unique))
+
+
+_CAT_PATTERN = compile_keyword_pattern(load_keywords())
+
+# class id -> cat-like; each class label is regex-matched only the first time it is seen
+_class_id_is_cat: Dict[int, bool] = {}
+
+
+def _label_is_cat(label) -> bool:
+    return _CAT_PATTERN.search(str(label).lower()) is not None
+
+
+def _class_is_cat(class_id, label) -> bool:
+    try:
+        key = int(class_id)
+    except (TypeError, ValueError):
+        return _label_is_cat(label)
+    matched = _class_id_is_cat.get(key)
+    if matched is None:
+        matched = _label_is_cat(label)
+        _class_id_is_cat[key] = matched
+    return matched
+
+
+def _first_result(results_list: list) -> Optional[dict]:
+    """PaddleClas yields a list of per-image dicts; dig out the first image's result."""
+    item = results_list[0] if results_list else None
+    if isinstance(item, list):
+        item = item[0] if item else None
+    return item if isinstance(item, dict) else None
+
+
+# ImageNet-1k class ids (inclusive ranges) that count as a cat or furry animal
+CAT_CLASS_ID_RANGES = (
+    (105, 105),  # koala
+    (150, 150),  # sea lion
+    (151, 268),  # dog breeds
+    (269, 280),  # wolves, coyote, wild dogs, hyena, foxes
+    (281, 293),  # domestic cats and wild cats
+    (294, 299),  # bears, mongoose, meerkat
+    (330, 338),  # rabbits, hare, hamster, porcupine, squirrel, marmot, beaver, guinea pig
+    (356, 362),  # weasel, mink, polecat, ferret, otter, skunk, badger
+    (365, 384),  # apes, monkeys, lemurs
+    (387, 388),  # lesser panda, giant panda
+)
+NUM_CLASSES = 1000
+
+
+def parse_class_id_ranges(text: str) -> Tuple[Tuple[int, int], ...]:
+    """Parse "151-293,330-338,105" into inclusive (start, end) ranges."""
+    ranges = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        ranges.append((int(start), int(end or start)))
+    return tuple(ranges)
+
+
+def build_class_lookup(ranges: Iterable[Tuple[int, int]], num_classes: int = NUM_CLASSES) -> np.ndarray:
+    lookup = np.zeros(num_classes, dtype=bool)
+    for start, end in ranges:
+        lookup[max(start, 0):min(end, num_classes - 1) + 1] = True
+    return lookup
+
+
+def cat_score_threshold() -> float:
+    """Minimum summed top-k probability of cat-like classes (CAT_SCORE_THRESHOLD, default 0.1)."""
+    try:
+        return float(os.getenv("CAT_SCORE_THRESHOLD", "0.1"))
+    except ValueError:
+        return 0.1
+
+
+_CAT_CLASS_LOOKUP = build_class_lookup(
+    parse_class_id_ranges(os.environ["CAT_CLASS_IDS"])
+    if os.getenv("CAT_CLASS_IDS")
+    else CAT_CLASS_ID_RANGES
+)
+
+
+def _cat_score(result: dict) -> Optional[float]:
+    """
+    Probability mass of cat-like classes among the returned top-k, or None when the
+    result has no usable class ids / scores (then label text matching is used instead).
+    """
+    class_ids = result.get("class_ids")
+    scores = result.get("scores")
+    if class_ids is None or scores is None:
+        return None
+    ids = np.asarray(class_ids, dtype=np.int64)
+    probs = np.asarray(scores, dtype=np.float32)
+    if ids.size == 0 or ids.shape != probs.shape:
+        return None
+    if ids.min() < 0 or ids.max() >= _CAT_CLASS_LOOKUP.size:
+        return None
+    return float(probs[_CAT_CLASS_LOOKUP[ids]].sum())
+
+
 def _labels_has_cat(results) -> bool:
-    # results is a generator, need to iterate through it
-    cat_keywords = [
-        "cat", "kitten", "tomcat", "tabby", "tiger cat", "siamese", "persian",
-        "egyptian cat", "lynx", "wildcat", "feline", "domestic cat", "house cat",
-        "maine coon", "british shorthair", "ragdoll", "munchkin", "scottish fold",
-        "bengal cat", "russian blue", "abyssinian", "birman", "oriental shorthair"
-    ]
-    
-    # 添加其他毛茸茸动物关键词，这些也会被识别为猫
-    furry_animal_keywords = [
-        "dog", "puppy", "puppies", "canine", "hound", "terrier", "retriever",
-        "shepherd", "spaniel", "poodle", "bulldog", "beagle", "chihuahua",
-        "rabbit", "bunny", "hare", "hamster", "guinea pig", "gerbil",
-        "ferret", "weasel", "mink", "otter", "raccoon", "raccoon dog",
-        "fox", "red fox", "arctic fox", "wolf", "coyote", "jackal",
-        "bear", "panda", "koala", "squirrel", "chipmunk", "marmot",
-        "hedgehog", "porcupine", "skunk", "badger", "wolverine",
-        "seal", "sea lion", "walrus", "otter", "beaver", "muskrat",
-        "chinchilla", "capybara", "lemur", "monkey", "ape", "gorilla",
-        "furry", "fluffy", "hairy", "fuzzy", "woolly", "downy"
-    ]
-    
-    # 合并所有关键词
-    all_keywords = cat_keywords + furry_animal_keywords
-    
-    # Convert generator to list to access the first result
+    # results may be a generator, need to iterate through it
     results_list = list(results)
-    rt = False
-    if len(results_list) > 0 and isinstance(results_list[0], dict):
-        labels = results_list[0].get("label_names") or []
-        labels_lc = [str(x).lower() for x in labels]
-        rt = any(any(k in lbl for k in all_keywords) for lbl in labels_lc)
+    result = _first_result(results_list)
+    score = _cat_score(result) if result is not None else None
+    if score is not None:
+        rt = score >= cat_score_threshold()
+    elif result is not None:
+        labels = result.get("label_names") or []
+        class_ids = result.get("class_ids")
+        if class_ids is not None and len(class_ids) == len(labels):
+            rt = any(_class_is_cat(cid, lbl) for cid, lbl in zip(class_ids, labels))
+        else:
+            rt = any(_label_is_cat(lbl) for lbl in labels)
     else:
         # Fallback: search in string representation
-        text = str(results_list).lower()
-        rt = any(k in text for k in all_keywords)
+        rt = _label_is_cat(results_list)
     if not rt:
         print(f"No cat or furry animal found in {results_list}")
     return rt
-
-
@@ -0,0 +1,195 @@
+import base64
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+# Small JPEG stored next to every frame for the /log page
+THUMB_MAX_SIZE = 160
+THUMB_QUALITY = 70
+THUMB_SUFFIX = ".thumb.jpg"
+
+# How /detect persists frames, see Frame.encode()
+STORAGE_POLICIES = ("original", "recompressed", "webp")
+
+# JPEG start-of-frame markers (baseline, progressive, lossless, ...) carrying the image size
+_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """(height, width) read from the JPEG frame header without decoding, or None."""
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # markers without a length
+            i += 2
+            continue
+        if marker in _SOF_MARKERS:
+            height = int.from_bytes(data[i + 5:i + 7], "big")
+            width = int.from_bytes(data[i + 7:i + 9], "big")
+            return height, width
+        i += 2 + int.from_bytes(data[i + 2:i + 4], "big")
+    return None
+
+
+def resize_image_if_needed(img: np.ndarray, max_size: int = 640) -> np.ndarray:
+    """
+    Resize image to at most max_size in the largest dimension while keeping aspect ratio.
+    Image is already flipped by ESP32, so no additional flipping needed.
+    Returns the input array unchanged when it already fits.
+    """
+    height, width = img.shape[:2]
+    if max(height, width) <= max_size:
+        return img
+
+    scale = max_size / max(height, width)
+    new_width = int(width * scale)
+    new_height = int(height * scale)
+    return cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_AREA)
+
+
+def thumbnail_path(image_path: str) -> str:
+    """Thumbnail location for a stored image path or url: /static/000001.jpg -> /static/000001.thumb.jpg"""
+    stem, dot, _ = image_path.rpartition(".")
+    return (stem if dot else image_path) + THUMB_SUFFIX
+
+
+def calculate_image_brightness(image_bytes: bytes) -> float:
+    """
+    Calculate the average brightness of a JPEG.
+    Returns a value between 0-255 where 0 is completely dark and 255 is completely bright.
+    Decodes only the luma plane at 1/8 scale (libjpeg scales in the DCT domain), which
+    is far cheaper than a full color decode and accurate enough for a darkness check.
+    """
+    try:
+        nparr = np.frombuffer(image_bytes, dtype=np.uint8)
+        gray = cv2.imdecode(nparr, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+        if gray is None:
+            return 0.0
+        return float(np.mean(gray))
+    except Exception as e:
+        print(f"Error calculating brightness: {e}")
+        return 0.0
+
+
+def is_image_too_dark(brightness: float, threshold: float = 30.0) -> bool:
+    """
+    Determine if an image is too dark based on brightness threshold.
+    Default threshold is 30 (0-255 scale).
+    """
+    return brightness < threshold
+
+
+@dataclass
+class Frame:
+    """
+    One uploaded camera frame. The JPEG is fully decoded (and resized) at most once,
+    on first use, and the result is shared by classification and persistence.
+    Brightness uses a cheap reduced decode so dark frames never need the full one.
+    """
+
+    raw: bytes
+    max_size: int = 320
+    _image: Optional[np.ndarray] = field(default=None, init=False, repr=False)
+    _decoded: bool = field(default=False, init=False, repr=False)
+    _resized: bool = field(default=False, init=False, repr=False)
+    _encodings: Dict[str, bytes] = field(default_factory=dict, init=False, repr=False)
+    _brightness: Optional[float] = field(default=None, init=False, repr=False)
+
+    @classmethod
+    def from_b64(cls, b64_image: str, max_size: int = 320) -> "Frame":
+        return cls(base64.b64decode(b64_image), max_size)
+
+    @property
+    def image(self) -> Optional[np.ndarray]:
+        """Decoded BGR image resized to max_size, or None if decoding failed."""
+        if not self._decoded:
+            self._decoded = True
+            try:
+                nparr = np.frombuffer(self.raw, dtype=np.uint8)
+                img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+                if img is not None:
+                    resized = resize_image_if_needed(img, self.max_size)
+                    self._resized = resized is not img
+                    img = resized
+                self._image = img
+            except Exception as e:
+                print(f"Error decoding image: {e}")
+                self._image = None
+        return self._image
+
+    def brightness(self) -> float:
+        """Mean luma from the raw bytes; does not trigger the full decode."""
+        if self._brightness is None:
+            self._brightness = calculate_image_brightness(self.raw)
+        return self._brightness
+
+    def fits(self) -> Optional[bool]:
+        """Whether the upload is already within max_size, or None if its size is unknown."""
+        if self._decoded and self._image is not None:
+            return not self._resized
+        dims = jpeg_dimensions(self.raw)
+        if dims is None:
+            return None
+        return max(dims) <= self.max_size
+
+    def encode(self, policy: str = "original") -> Tuple[bytes, str]:
+        """
+        Bytes to persist and their file extension, following the storage policy:
+          original     - keep the uploaded bytes when no resize is needed (no re-encode,
+                         no generation loss), otherwise JPEG-encode the resized image
+          recompressed - always JPEG-encode the decoded image at JPEG_QUALITY
+          webp         - encode the decoded image as WebP
+        Falls back to the raw upload when it can't be decoded.
+        """
+        if policy not in STORAGE_POLICIES:
+            policy = "original"
+        if policy == "original" and self.fits():
+            return self.raw, ".jpg"
+        if policy == "webp":
+            return self._encoded(".webp", [cv2.IMWRITE_WEBP_QUALITY, WEBP_QUALITY])
+        return self._encoded(".jpg", [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+
+    def thumbnail(self, max_size: int = THUMB_MAX_SIZE) -> Optional[bytes]:
+        """
+        JPEG thumbnail of at most max_size pixels. Reuses the decoded image when there is
+        one; otherwise (e.g. dark frames) libjpeg decodes at 1/2 scale, which is enough.
+        """
+        try:
+            if self._decoded:
+                img = self._image
+            else:
+                nparr = np.frombuffer(self.raw, dtype=np.uint8)
+                img = cv2.imdecode(nparr, cv2.IMREAD_REDUCED_COLOR_2)
+            if img is None:
+                return None
+            img = resize_image_if_needed(img, max_size)
+            ok, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, THUMB_QUALITY])
+            return encoded.tobytes() if ok else None
+        except Exception as e:
+            print(f"Error creating thumbnail: {e}")
+            return None
+
+    def _encoded(self, ext: str, params: list) -> Tuple[bytes, str]:
+        cached = self._encodings.get(ext)
+        if cached is not None:
+            return cached, ext
+        img = self.image
+        if img is None:
+            return self.raw, ".jpg"
+        ok, encoded = cv2.imencode(ext, img, params)
+        if not ok:
+            return self.raw, ".jpg"
+        self._encodings[ext] = encoded.tobytes()
+        return self._encodings[ext], ext
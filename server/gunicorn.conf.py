@@ -0,0 +1,52 @@
+"""
+gunicorn -c gunicorn.conf.py wsgi:app
+
+The app module is imported once in the master, but nothing that must not cross a
+fork runs there: every worker loads the model after it is forked, and retention
+runs in exactly one worker, the one holding the RETENTION_LOCK_FILE lock. When
+that worker exits the lock is released and the worker gunicorn forks to replace
+it takes over. Every worker flushes its own write-behind queue on graceful
+shutdown (SIGTERM, or SIGHUP on reload). The thermometer poller is per worker
+too: each one that serves /api/thermometers polls the cloud until it goes idle.
+"""
+
+import fcntl
+import os
+
+bind = os.getenv("BIND", f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8099')}")
+workers = int(os.getenv("WEB_WORKERS", "2"))
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "4"))
+preload_app = True
+timeout = int(os.getenv("WEB_TIMEOUT", "60"))  # first classification of a cold worker can be slow
+graceful_timeout = 30
+
+_retention_lock = None  # lock file held open by the worker that runs retention
+
+
+def _acquire_retention_lock() -> bool:
+    global _retention_lock
+    lock = open(os.getenv("RETENTION_LOCK_FILE", "retention.lock"), "a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return False
+    _retention_lock = lock
+    return True
+
+
+def post_fork(server, worker):
+    # Load the model (or start the inference pool) in the worker, never in the master
+    import app
+
+    app.warm_up_model()
+    if _acquire_retention_lock():
+        server.log.info("Retention runs in worker %s", os.getpid())
+        app.start_background_jobs()
+
+
+def worker_exit(server, worker):
+    import app
+
+    app.shutdown()
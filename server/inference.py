@@ -0,0 +1,240 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+import detection
+from background import BackgroundWorker
+from detection import paddle_has_cat_batch, paddle_has_cat_from_array
+
+# inline: classify in the request thread; batch: micro-batch frames in a background worker;
+# process: classify in a pool of worker processes, each with its own preloaded model
+INFERENCE_MODES = ("inline", "batch", "process")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+class BatchInferenceWorker:
+    """
+    Background thread that collects frames for up to max_wait_ms (or until
+    max_batch_size frames are queued) and classifies them as one batch.
+    """
+
+    def __init__(self, max_batch_size: int = 4, max_wait_ms: int = 50, model_name: str = None):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self.model_name = model_name
+        self._worker = BackgroundWorker("batch-inference", self._run)
+
+    def submit(self, img: np.ndarray) -> Future:
+        """Queue a frame; the returned future resolves to (has_cat, error)."""
+        future: Future = Future()
+        self._worker.ensure_started()
+        self._worker.queue.put((img, future))
+        return future
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._worker.stop(timeout)
+
+    def _run(self) -> None:
+        while True:
+            batch, stopping = self._worker.next_batch(self.max_batch_size, self.max_wait)
+            if batch:
+                self._process(batch)
+            if stopping:
+                return
+
+    def _process(self, batch: List[Tuple[np.ndarray, Future]]) -> None:
+        images = [img for img, _ in batch]
+        try:
+            results = paddle_has_cat_batch(images, self.model_name)
+        except Exception as e:
+            results = [(False, str(e))] * len(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+def _shared_memory():
+    # multiprocessing.shared_memory needs Python 3.8+; only process mode uses it
+    from multiprocessing import shared_memory
+    return shared_memory
+
+
+def process_mode_supported() -> bool:
+    try:
+        _shared_memory()
+    except ImportError:
+        return False
+    return True
+
+
+def _attach_shared_memory(name: str):
+    shared_memory = _shared_memory()
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        # Older versions also track attached segments and would unlink them when the
+        # worker exits; the parent process owns the segment and unlinks it itself.
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+def _init_process_worker(model_name: Optional[str]) -> None:
+    """Pool initializer: load the model once per worker process."""
+    try:
+        elapsed = detection.warm_up(model_name)
+        print(f"[pid {os.getpid()}] Model warm-up finished in {elapsed:.2f}s")
+    except Exception as e:
+        print(f"[pid {os.getpid()}] Model warm-up failed: {e}")
+
+
+def _classify_shared_frame(shm_name: str, shape: Tuple[int, ...], dtype: str) -> Tuple[bool, str]:
+    """Runs in a worker process: classify the frame stored in a shared memory block."""
+    shm = _attach_shared_memory(shm_name)
+    try:
+        img = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        result = paddle_has_cat_from_array(img)
+        # Drop the view before closing, the buffer can't be released while exported
+        del img
+        return result
+    finally:
+        shm.close()
+
+
+class ProcessInferencePool:
+    """
+    Pool of worker processes for CPU-bound inference. Frames are handed over through
+    shared memory so only the block name, shape and dtype are pickled per request.
+    """
+
+    def __init__(self, processes: int = None, model_name: str = None):
+        self.processes = max(1, processes or os.cpu_count() or 1)
+        self.model_name = model_name
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        # multiprocessing.Pool starts all workers up front, so every model is preloaded
+        with self._lock:
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(
+                    processes=self.processes,
+                    initializer=_init_process_worker,
+                    initargs=(self.model_name,),
+                )
+
+    def classify(self, img: np.ndarray, timeout: float = 30) -> Tuple[bool, str]:
+        self.start()
+        img = np.ascontiguousarray(img)
+        shm = _shared_memory().SharedMemory(create=True, size=max(1, img.nbytes))
+        try:
+            shared = np.ndarray(img.shape, dtype=img.dtype, buffer=shm.buf)
+            shared[...] = img
+            del shared
+            result = self._pool.apply_async(
+                _classify_shared_frame, (shm.name, img.shape, img.dtype.str)
+            )
+            return result.get(timeout)
+        except multiprocessing.TimeoutError:
+            return False, "inference timed out"
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def stop(self) -> None:
+        with self._lock:
+            pool = self._pool
+            self._pool = None
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+_batch_worker: Optional[BatchInferenceWorker] = None
+_batch_worker_lock = threading.Lock()
+
+
+_process_pool: Optional[ProcessInferencePool] = None
+_process_pool_lock = threading.Lock()
+_process_mode_warned = False
+
+
+def inference_mode() -> str:
+    global _process_mode_warned
+    mode = os.getenv("INFERENCE_MODE", "inline").strip().lower()
+    if mode == "process" and not process_mode_supported():
+        if not _process_mode_warned:
+            _process_mode_warned = True
+            print("INFERENCE_MODE=process needs Python 3.8+, classifying inline")
+        return "inline"
+    return mode if mode in INFERENCE_MODES else "inline"
+
+
+def get_batch_worker() -> BatchInferenceWorker:
+    global _batch_worker
+    with _batch_worker_lock:
+        if _batch_worker is None:
+            _batch_worker = BatchInferenceWorker(
+                max_batch_size=_env_int("INFERENCE_MAX_BATCH", 4),
+                max_wait_ms=_env_int("INFERENCE_MAX_WAIT_MS", 50),
+            )
+        return _batch_worker
+
+
+def get_process_pool() -> ProcessInferencePool:
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessInferencePool(processes=_env_int("INFERENCE_WORKERS", 0))
+        return _process_pool
+
+
+def shutdown() -> None:
+    """Stop the batch worker and the worker process pool, if they were started."""
+    with _batch_worker_lock:
+        worker = _batch_worker
+    if worker is not None:
+        worker.stop()
+    with _process_pool_lock:
+        pool = _process_pool
+    if pool is not None:
+        pool.stop()
+
+
+def warm_up() -> float:
+    """Preload the model for the configured executor. Returns elapsed seconds."""
+    if inference_mode() == "process":
+        start = time.time()
+        get_process_pool().start()
+        return time.time() - start
+    return detection.warm_up()
+
+
+def classify(img: Optional[np.ndarray]) -> Tuple[bool, str]:
+    """Classify a decoded BGR frame using the executor selected by INFERENCE_MODE."""
+    if img is None:
+        return False, "failed to decode image"
+    mode = inference_mode()
+    if mode == "process":
+        return get_process_pool().classify(img, timeout=_env_int("INFERENCE_TIMEOUT", 30))
+    if mode == "batch":
+        future = get_batch_worker().submit(img)
+        try:
+            return future.result(timeout=_env_int("INFERENCE_TIMEOUT", 30))
+        except FutureTimeoutError:
+            return False, "inference timed out"
+    return paddle_has_cat_from_array(img)
@@ -0,0 +1,170 @@
+import os
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+import database as db
+from storage import ImageStore
+
+# Only limit enforced by default: history is kept for weeks, but images can't fill the disk
+DEFAULT_DISK_BUDGET_MB = 1024.0
+
+
+def _env_number(name: str, cast=float):
+    value = os.getenv(name, "").strip()
+    if not value:
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        print(f"Ignoring invalid {name}={value!r}")
+        return None
+
+
+@dataclass
+class RetentionPolicy:
+    """
+    Which detection records (and their images) to keep. Every limit that is set
+    is enforced; keep_positives_days exempts recent cat detections from all of them.
+    """
+
+    keep_last: Optional[int] = None  # keep at most this many newest records
+    max_age_days: Optional[float] = None  # delete records older than this
+    keep_positives_days: Optional[float] = None  # never delete cat detections younger than this
+    disk_budget_mb: Optional[float] = DEFAULT_DISK_BUDGET_MB  # MB of newest images to keep
+    interval: float = 300.0  # seconds between runs
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        disk_budget_mb = _env_number("RETENTION_DISK_BUDGET_MB")
+        if disk_budget_mb is None:
+            disk_budget_mb = DEFAULT_DISK_BUDGET_MB
+        return cls(  # 0 disables a limit
+            keep_last=_env_number("RETENTION_KEEP_LAST", int) or None,
+            max_age_days=_env_number("RETENTION_MAX_AGE_DAYS"),
+            keep_positives_days=_env_number("RETENTION_KEEP_POSITIVES_DAYS"),
+            disk_budget_mb=disk_budget_mb or None,
+            interval=_env_number("RETENTION_INTERVAL") or 300.0,
+        )
+
+
+class RetentionJob:
+    """
+    Background thread applying a RetentionPolicy to the log table and image files.
+    Day directories left without records are deleted in one go instead of file by file.
+    """
+
+    def __init__(self, policy: RetentionPolicy, store: ImageStore):
+        self.policy = policy
+        self.store = store
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.deleted_records = 0
+        self.deleted_files = 0
+        self.deleted_days = 0
+        self.last_run: Optional[str] = None
+        self.last_error: Optional[str] = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Retention run failed: {e}")
+            self._stop.wait(self.policy.interval)
+
+    def boundary_id(self) -> Optional[int]:
+        """Records with an id below this are outside at least one retention limit."""
+        policy = self.policy
+        boundaries = []
+        if policy.keep_last:
+            boundaries.append(db.id_boundary_keep_latest(policy.keep_last))
+        if policy.max_age_days is not None:
+            boundaries.append(db.id_boundary_since(_iso_days_ago(policy.max_age_days)))
+        if policy.disk_budget_mb is not None:
+            boundaries.append(db.id_boundary_disk_budget(int(policy.disk_budget_mb * 1024 * 1024)))
+        boundaries = [b for b in boundaries if b is not None]
+        return max(boundaries) if boundaries else None
+
+    def run_once(self) -> int:
+        """Apply the policy once. Returns the number of deleted records."""
+        boundary = self.boundary_id()
+        deleted: List[dict] = []
+        if boundary is not None:
+            keep_since = None
+            if self.policy.keep_positives_days is not None:
+                keep_since = _iso_days_ago(self.policy.keep_positives_days)
+            deleted = db.delete_records_before(boundary, keep_positives_since=keep_since)
+        paths = [item["image_path"] for item in deleted]
+        days = self.empty_days(paths)
+        removed = sum(self.store.remove_day(day) for day in days)
+        removed += self.store.remove(p for p in paths if self.store.day_of(p) not in days)
+        self.runs += 1
+        self.deleted_records += len(deleted)
+        self.deleted_files += removed
+        self.deleted_days += len(days)
+        self.last_run = datetime.now().isoformat()
+        self.last_error = None
+        if deleted or days:
+            print(f"Retention removed {len(deleted)} records, {removed} files and {len(days)} day directories")
+        return len(deleted)
+
+    def empty_days(self, deleted_paths: List[str]) -> Set[date]:
+        """
+        Day directories with no records left: days of the deleted rows that no longer
+        have any, plus every directory older than the oldest record (e.g. left over
+        after a crash). Today and yesterday are skipped, the writer may still be
+        filling them before their rows are inserted.
+        """
+        latest = date.today() - timedelta(days=1)
+        oldest_ts = db.oldest_ts()
+        oldest_day = date.fromisoformat(oldest_ts[:10]) if oldest_ts else latest
+        candidates = {day for day in self.store.days() if day < oldest_day}
+        candidates.update(d for d in map(self.store.day_of, deleted_paths) if d is not None)
+        return {
+            day for day in candidates
+            if day < latest
+            and not db.has_records_between(day.isoformat(), (day + timedelta(days=1)).isoformat())
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "deleted_records": self.deleted_records,
+            "deleted_files": self.deleted_files,
+            "deleted_days": self.deleted_days,
+            "last_run": self.last_run,
+            "last_error": self.last_error,
+            "policy": {
+                "keep_last": self.policy.keep_last,
+                "max_age_days": self.policy.max_age_days,
+                "keep_positives_days": self.policy.keep_positives_days,
+                "disk_budget_mb": self.policy.disk_budget_mb,
+                "interval": self.policy.interval,
+            },
+        }
+
+
+def _iso_days_ago(days: float) -> str:
+    # Same format as the ts column written by /detect, so string comparison orders correctly
+    return (datetime.now() - timedelta(days=days)).isoformat()
@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+THUMB_SIZE = 32
+
+
+@dataclass
+class SceneSignature:
+    thumb: np.ndarray  # THUMB_SIZE x THUMB_SIZE grayscale, uint8
+    phash: int  # 64-bit DCT perceptual hash
+
+
+@dataclass
+class _SceneEntry:
+    signature: SceneSignature
+    verdict: Tuple[bool, str]
+    ts: float
+
+
+def compute_signature(img: np.ndarray) -> SceneSignature:
+    """Downscaled grayscale thumbnail plus perceptual hash of a BGR frame."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    thumb = cv2.resize(gray, (THUMB_SIZE, THUMB_SIZE), interpolation=cv2.INTER_AREA)
+    dct = cv2.dct(thumb.astype(np.float32))[:8, :8].flatten()
+    low = dct[1:]  # skip the DC term, it only carries overall brightness
+    bits = np.concatenate(([False], low > np.median(low)))
+    phash = int("".join("1" if b else "0" for b in bits), 2)
+    return SceneSignature(thumb=thumb, phash=phash)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class SceneChangeCache:
+    """
+    Remembers the last classified frame per camera. When a new frame from the same
+    camera is close enough (perceptual hash and thumbnail difference), the previous
+    verdict is reused instead of running the classifier again.
+    """
+
+    def __init__(
+        self,
+        max_hash_distance: int = 6,
+        max_mean_diff: float = 8.0,
+        max_age: float = 60.0,
+        max_cameras: int = 64,
+    ):
+        self.max_hash_distance = max_hash_distance
+        self.max_mean_diff = max_mean_diff
+        self.max_age = max_age
+        self.max_cameras = max_cameras
+        self._entries: Dict[str, _SceneEntry] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "SceneChangeCache":
+        return cls(
+            max_hash_distance=int(os.getenv("SCENE_HASH_DISTANCE", "6")),
+            max_mean_diff=float(os.getenv("SCENE_MEAN_DIFF", "8.0")),
+            max_age=float(os.getenv("SCENE_MAX_AGE", "60")),
+        )
+
+    def lookup(self, camera: str, signature: SceneSignature) -> Optional[Tuple[bool, str]]:
+        """Return the cached verdict if the scene is unchanged, else None (and count a miss)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(camera)
+            if entry is not None and self._is_same_scene(entry, signature, now):
+                self.hits += 1
+                return entry.verdict
+            self.misses += 1
+            return None
+
+    def update(self, camera: str, signature: SceneSignature, verdict: Tuple[bool, str]) -> None:
+        _, err = verdict
+        with self._lock:
+            if err:
+                # Never reuse a failed classification
+                self._entries.pop(camera, None)
+                return
+            if camera not in self._entries and len(self._entries) >= self.max_cameras:
+                oldest = min(self._entries, key=lambda key: self._entries[key].ts)
+                del self._entries[oldest]
+            self._entries[camera] = _SceneEntry(signature, verdict, time.monotonic())
+
+    def _is_same_scene(self, entry: _SceneEntry, signature: SceneSignature, now: float) -> bool:
+        if now - entry.ts > self.max_age:
+            return False
+        if hamming_distance(entry.signature.phash, signature.phash) > self.max_hash_distance:
+            return False
+        diff = cv2.absdiff(entry.signature.thumb, signature.thumb)
+        return float(np.mean(diff)) <= self.max_mean_diff
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "cameras": len(self._entries),
+                "max_hash_distance": self.max_hash_distance,
+                "max_mean_diff": self.max_mean_diff,
+                "max_age": self.max_age,
+            }
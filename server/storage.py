@@ -0,0 +1,137 @@
+import os
+import shutil
+import threading
+from datetime import date, datetime
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import database as db
+from frame import THUMB_SUFFIX, thumbnail_path
+
+# Image IDs are reserved from the SQLite counter in blocks, so its write lock is taken
+# once per ID_BLOCK_SIZE images; IDs left over in a block at exit are simply skipped
+ID_BLOCK_SIZE = 64
+
+
+class ImageStore:
+    """
+    Detection images under root/YYYY/MM/DD/NNNNNN.ext. The log table stores the
+    path relative to root; rows written by older versions hold a /static/... url
+    instead, and every method here accepts both.
+    """
+
+    def __init__(self, root: Path, url_path: str = "/static", id_block_size: int = ID_BLOCK_SIZE):
+        self.root = Path(root)
+        self.url_path = url_path.rstrip("/")
+        self.id_block_size = max(1, id_block_size)
+        self._id_lock = threading.Lock()
+        self._next_id = 0
+        self._block_end = 0
+        self._id_pid: Optional[int] = None
+
+    def new_image_path(self, ext: str, now: Optional[datetime] = None) -> str:
+        """Relative path for a new image; the ID comes from the SQLite counter, so it never repeats."""
+        now = now or datetime.now()
+        img_id = self._next_image_id()
+        return f"{now:%Y/%m/%d}/{img_id:06d}{ext}"  # 如 2025/01/31/000001.jpg
+
+    def _next_image_id(self) -> int:
+        with self._id_lock:
+            # A forked worker must not hand out the rest of its parent's block
+            if self._id_pid != os.getpid() or self._next_id >= self._block_end:
+                self._next_id = db.reserve_counter_block("image", self.id_block_size)
+                self._block_end = self._next_id + self.id_block_size
+                self._id_pid = os.getpid()
+            img_id = self._next_id
+            self._next_id += 1
+            return img_id
+
+    def url_for(self, stored: Optional[str]) -> str:
+        if not stored:
+            return ""
+        stored = stored.replace("\\", "/")
+        if stored.startswith("/"):
+            return stored  # legacy row, already a url
+        return f"{self.url_path}/{stored}"
+
+    def path_for(self, stored: Optional[str]) -> Optional[Path]:
+        """File under root for a stored path or /static url, None if it points elsewhere."""
+        if not stored:
+            return None
+        relative = stored.replace("\\", "/")
+        prefix = self.url_path + "/"
+        if relative.startswith(prefix):
+            relative = relative[len(prefix):]
+        elif relative.startswith("/"):
+            return None
+        if not relative or ".." in relative.split("/"):
+            return None
+        return self.root / relative
+
+    @staticmethod
+    def day_of(stored: Optional[str]) -> Optional[date]:
+        """Shard date of a relative path like 2025/01/31/000001.jpg, None for legacy flat files."""
+        parts = (stored or "").replace("\\", "/").split("/")
+        if len(parts) != 4:
+            return None
+        try:
+            return date(int(parts[0]), int(parts[1]), int(parts[2]))
+        except ValueError:
+            return None
+
+    def day_dir(self, day: date) -> Path:
+        return self.root / f"{day:%Y/%m/%d}"
+
+    def days(self) -> List[date]:
+        """Dates that have a shard directory, oldest first. Lists three small directory levels only."""
+        found = []
+        for year in self._numeric_dirs(self.root):
+            for month in self._numeric_dirs(year):
+                for day in self._numeric_dirs(month):
+                    try:
+                        found.append(date(int(year.name), int(month.name), int(day.name)))
+                    except ValueError:
+                        continue
+        return sorted(found)
+
+    @staticmethod
+    def _numeric_dirs(parent: Path) -> List[Path]:
+        try:
+            return [p for p in parent.iterdir() if p.is_dir() and p.name.isdigit()]
+        except OSError:
+            return []
+
+    def remove(self, stored_paths: Iterable[str]) -> int:
+        """Delete single images and their thumbnails. Returns the number of images removed."""
+        removed = 0
+        for stored in stored_paths:
+            path = self.path_for(stored)
+            if path is None:
+                continue
+            try:
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Failed to remove {path}: {e}")
+            try:
+                Path(thumbnail_path(str(path))).unlink()
+            except OSError:
+                pass  # no thumbnail (older record) or already gone
+        return removed
+
+    def remove_day(self, day: date) -> int:
+        """Delete a whole day directory at once. Returns the number of images it held."""
+        directory = self.day_dir(day)
+        try:
+            count = sum(1 for p in directory.iterdir() if not p.name.endswith(THUMB_SUFFIX))
+        except OSError:
+            return 0
+        shutil.rmtree(directory, ignore_errors=True)
+        for parent in (directory.parent, directory.parent.parent):  # drop empty month / year
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+        return count
@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import unittest
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import detection
+
+# Frames whose first pixel has this value make FakeEngine stall (timeout tests)
+SLOW_PIXEL = 7
+SLOW_SECONDS = 2.0
+
+CAT_RESULT = {"class_ids": [281, 285], "scores": [0.8, 0.1], "label_names": ["tabby, tabby cat", "Egyptian cat"]}
+NO_CAT_RESULT = {"class_ids": [0, 1], "scores": [0.9, 0.05], "label_names": ["tench", "goldfish"]}
+
+
+def frame(cat: bool, slow: bool = False) -> np.ndarray:
+    """Bright frames are cats for FakeEngine, dark ones are not."""
+    img = np.full((48, 64, 3), 200 if cat else 20, dtype=np.uint8)
+    if slow:
+        img[0, 0, 0] = SLOW_PIXEL
+    return img
+
+
+class FakeEngine:
+    """Stands in for PaddleEngine / OpenCVDnnEngine: classifies by mean brightness."""
+
+    created: List[str] = []
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.batch_sizes: List[int] = []
+        FakeEngine.created.append(model_name)
+
+    def predict_batch(self, images: List[np.ndarray]) -> List[dict]:
+        self.batch_sizes.append(len(images))
+        if any(img[0, 0, 0] == SLOW_PIXEL for img in images):
+            time.sleep(SLOW_SECONDS)
+        return [dict(CAT_RESULT if img.mean() >= 128 else NO_CAT_RESULT) for img in images]
+
+
+class FakeEngineTestCase(unittest.TestCase):
+    """Loads FakeEngine instead of a real model through detection._create_engine."""
+
+    env = {"DETECTION_ENGINE": "paddle", "PADDLECLAS_MODEL_NAME": "FakeNet"}
+
+    def setUp(self):
+        self._original_create_engine = detection._create_engine
+        self._original_env = {name: os.environ.get(name) for name in self.env}
+        os.environ.update(self.env)
+        detection._create_engine = lambda engine, model_name: FakeEngine(model_name)
+        detection.clear_model_cache()
+        FakeEngine.created = []
+
+    def tearDown(self):
+        detection._create_engine = self._original_create_engine
+        detection.clear_model_cache()
+        for name, value in self._original_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
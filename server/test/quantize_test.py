@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+量化模型测试脚本 - 用 test/ 目录下的图片做 INT8 训练后量化校准，
+对比 fp32 / fp16 / int8 的猫检测准确率，并写入精度门限文件。
+
+用法: python quantize_test.py model.onnx [--max-drop 0.05]
+
+只有准确率下降不超过 --max-drop 的精度才会被标记为 accepted，
+服务端设置 DETECTION_PRECISION=int8 / fp16 时会检查该文件，未通过则回退到 fp32。
+门限文件记录了模型的 sha256，模型文件变化后需要重新运行本脚本。
+
+INT8 量化需要 onnxruntime (pip install onnxruntime)，未安装时跳过校准，
+没有已生成的 int8 模型时 int8 记为未通过。
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import cv2
+
+# Ensure parent directory (server/) is on path so we can import detection.py
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from detection import (
+    OpenCVDnnEngine,
+    engine_has_cat,
+    imagenet_blob,
+    model_digest,
+    quantization_gate_path,
+    quantized_model_path,
+)
+
+
+def get_ground_truth(filename):
+    """根据文件名确定真实标签：以'---'开头的不是猫，其他都是猫"""
+    return not filename.startswith("---")
+
+
+def load_test_images(test_dir):
+    images = []
+    for img_path in sorted(test_dir.glob("*.jpg")):
+        img = cv2.imread(str(img_path), cv2.IMREAD_COLOR)
+        if img is None:
+            print(f"  {img_path.name} -> 无法读取，跳过")
+            continue
+        images.append((img_path.name, img, get_ground_truth(img_path.name)))
+    return images
+
+
+def quantize_int8(model_path, images):
+    """用测试图片做静态量化校准，生成 model.int8.onnx"""
+    from onnxruntime import InferenceSession
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    input_name = InferenceSession(model_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class TestImageReader(CalibrationDataReader):
+        def __init__(self):
+            self._feeds = iter([{input_name: imagenet_blob([img])} for _, img, _ in images])
+
+        def get_next(self):
+            return next(self._feeds, None)
+
+    output_path = quantized_model_path(model_path)
+    quantize_static(
+        model_path,
+        output_path,
+        TestImageReader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    return output_path
+
+
+def evaluate(model_path, precision, images):
+    """测试单个精度的准确率"""
+    print(f"\n=== 测试精度: {precision} ===")
+    engine = OpenCVDnnEngine(model_path, precision=precision)
+    correct = 0
+    start_time = time.time()
+    for name, img, ground_truth in images:
+        predicted_cat = engine_has_cat(engine, img)
+        if predicted_cat == ground_truth:
+            correct += 1
+        else:
+            print(f"  {name} -> 预测: {predicted_cat}, 实际: {ground_truth} ❌")
+    avg_time = (time.time() - start_time) / len(images)
+    accuracy = correct / len(images)
+    print(f"  准确率: {accuracy:.2%} ({correct}/{len(images)})")
+    print(f"  平均推理时间: {avg_time:.3f}秒")
+    return {"accuracy": accuracy, "correct": correct, "total": len(images), "avg_time": avg_time}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate and gate reduced-precision models")
+    parser.add_argument("model", help="float ONNX model used by DETECTION_ONNX_MODEL")
+    parser.add_argument("--max-drop", type=float, default=0.05,
+                        help="largest accepted accuracy drop vs. fp32 (default 0.05)")
+    args = parser.parse_args()
+
+    test_images = load_test_images(Path(__file__).parent)
+    if not test_images:
+        print("No .jpg files found in", Path(__file__).parent)
+        raise SystemExit(1)
+    print(f"找到 {len(test_images)} 个测试图片")
+
+    print("\n正在用测试图片校准 INT8 量化模型...")
+    try:
+        print(f"  已生成: {quantize_int8(args.model, test_images)}")
+    except ImportError:
+        print("  未安装 onnxruntime，跳过 INT8 校准 (pip install onnxruntime)")
+    except Exception as e:
+        print(f"  INT8 量化失败: {e}")
+
+    baseline = evaluate(args.model, "fp32", test_images)
+    gate = {
+        "model": args.model,
+        "model_sha256": model_digest(args.model),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "max_drop": args.max_drop,
+        "fp32": baseline,
+    }
+    for precision in ("fp16", "int8"):
+        try:
+            result = evaluate(args.model, precision, test_images)
+        except Exception as e:
+            print(f"  {precision} 测试失败: {e}")
+            gate[precision] = {"accepted": False, "error": str(e)}
+            continue
+        if precision == "int8":
+            result["sha256"] = model_digest(quantized_model_path(args.model))
+        result["delta"] = result["accuracy"] - baseline["accuracy"]
+        result["accepted"] = -result["delta"] <= args.max_drop
+        gate[precision] = result
+
+    print(f"\n{'='*60}")
+    print("精度对比汇总:")
+    print(f"{'='*60}")
+    print(f"{'精度':<8} {'准确率':<10} {'差值':<10} {'平均时间':<10} {'结果':<10}")
+    print(f"{'-'*60}")
+    print(f"{'fp32':<8} {baseline['accuracy']:<10.2%} {'-':<10} {baseline['avg_time']:<10.3f} 基准")
+    for precision in ("fp16", "int8"):
+        result = gate[precision]
+        if "accuracy" not in result:
+            print(f"{precision:<8} {'-':<10} {'-':<10} {'-':<10} 失败")
+            continue
+        verdict = "✅ 启用" if result["accepted"] else "❌ 拒绝"
+        print(f"{precision:<8} {result['accuracy']:<10.2%} {result['delta']:<+10.2%} {result['avg_time']:<10.3f} {verdict}")
+
+    gate_path = quantization_gate_path(args.model)
+    with open(gate_path, "w", encoding="utf-8") as f:
+        json.dump(gate, f, indent=2, ensure_ascii=False)
+    print(f"\n精度门限已写入: {gate_path}")
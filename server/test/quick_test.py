@@ -17,7 +17,7 @@ os.environ['PYTHONIOENCODING'] = 'utf-8'
 # Ensure parent directory (server/) is on path so we can import detection.py
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-from detection import paddle_has_cat_from_bytes
+from detection import evict_model, paddle_has_cat_from_bytes
 
 # 快速测试的模型列表（选择几个代表性模型）
 QUICK_TEST_MODELS = [
@@ -130,9 +130,11 @@ if __name__ == "__main__":
             if result:
                 results.append(result)
             # 清理内存，为下一个模型做准备
+            evict_model(model_name)
             gc.collect()
         except Exception as e:
             print(f"模型 {model_name} 测试失败: {e}")
+            evict_model(model_name)
             gc.collect()
     
     # 打印结果汇总
@@ -0,0 +1,26 @@
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import database as db
+
+
+class TempDatabaseTestCase(unittest.TestCase):
+    """Points database.py at an empty SQLite file in a temp directory for each test."""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self._original_db_file = db.DB_FILE
+        db.close_all()
+        db.DB_FILE = str(self.tmp / "detect.db")
+        db.init_db()
+
+    def tearDown(self):
+        db.close_all()
+        db.DB_FILE = self._original_db_file
+        shutil.rmtree(self.tmp, ignore_errors=True)
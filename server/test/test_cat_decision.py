@@ -0,0 +1,138 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import detection
+
+
+class KeywordTests(unittest.TestCase):
+    def setUp(self):
+        self._original_env = os.environ.get("CAT_KEYWORDS_FILE")
+        self._original_memo = dict(detection._class_id_is_cat)
+        detection._class_id_is_cat.clear()
+
+    def tearDown(self):
+        if self._original_env is None:
+            os.environ.pop("CAT_KEYWORDS_FILE", None)
+        else:
+            os.environ["CAT_KEYWORDS_FILE"] = self._original_env
+        detection._class_id_is_cat.clear()
+        detection._class_id_is_cat.update(self._original_memo)
+
+    def write_keywords(self, text: str) -> str:
+        handle, path = tempfile.mkstemp(suffix=".txt")
+        with os.fdopen(handle, "w", encoding="utf-8") as f:
+            f.write(text)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_keywords_file_skips_comments_and_blank_lines(self):
+        path = self.write_keywords("# cats only\nCat\n\n  lynx  # wild\n#dog\n")
+        self.assertEqual(detection.load_keywords(path), ("cat", "lynx"))
+
+        os.environ["CAT_KEYWORDS_FILE"] = path
+        self.assertEqual(detection.load_keywords(), ("cat", "lynx"))
+
+    def test_built_in_keywords_without_file(self):
+        os.environ.pop("CAT_KEYWORDS_FILE", None)
+        keywords = detection.load_keywords()
+        self.assertIn("tabby", keywords)
+        self.assertIn("dog", keywords)
+
+    def test_compiled_pattern_matches_substrings_like_the_old_scan(self):
+        pattern = detection.compile_keyword_pattern(["cat", "Tiger Cat", "a.b"])
+        self.assertIsNotNone(pattern.search("egyptian cat"))
+        self.assertEqual(pattern.search("tiger cat").group(0), "tiger cat")  # longest first
+        self.assertIsNotNone(pattern.search("a.b"))
+        self.assertIsNone(pattern.search("axb"))  # keywords are literal
+        self.assertIsNone(detection.compile_keyword_pattern([]).search("cat"))
+
+    def test_class_ids_are_matched_once(self):
+        self.assertTrue(detection._class_is_cat(281, "tabby, tabby cat"))
+        self.assertFalse(detection._class_is_cat(0, "tench"))
+        self.assertEqual(detection._class_id_is_cat, {281: True, 0: False})
+        # Later results reuse the memo instead of the label
+        self.assertTrue(detection._class_is_cat("281", "tench"))
+
+    def test_unusable_class_id_falls_back_to_label(self):
+        self.assertTrue(detection._class_is_cat(None, "Persian cat"))
+        self.assertFalse(detection._class_is_cat("n/a", "tench"))
+        self.assertEqual(detection._class_id_is_cat, {})
+
+
+def result(class_ids, scores, labels=None):
+    """One image's PaddleClas result, nested the way PaddleClas.predict() yields it."""
+    labels = labels if labels is not None else [""] * len(class_ids)
+    return [[{"class_ids": class_ids, "scores": scores, "label_names": labels}]]
+
+
+class CatScoreTests(unittest.TestCase):
+    def setUp(self):
+        self._original_env = os.environ.get("CAT_SCORE_THRESHOLD")
+        self._original_lookup = detection._CAT_CLASS_LOOKUP
+        self._original_memo = dict(detection._class_id_is_cat)
+        os.environ.pop("CAT_SCORE_THRESHOLD", None)
+
+    def tearDown(self):
+        if self._original_env is None:
+            os.environ.pop("CAT_SCORE_THRESHOLD", None)
+        else:
+            os.environ["CAT_SCORE_THRESHOLD"] = self._original_env
+        detection._CAT_CLASS_LOOKUP = self._original_lookup
+        detection._class_id_is_cat.clear()
+        detection._class_id_is_cat.update(self._original_memo)
+
+    def test_threshold_boundary(self):
+        # Labels would say "cat"; the decision must come from ids and scores
+        self.assertTrue(detection._labels_has_cat(result([0, 281], [0.9, 0.1], ["tench", "tabby"])))
+        self.assertFalse(detection._labels_has_cat(result([0, 281], [0.9, 0.0999], ["tench", "tabby"])))
+
+    def test_cat_like_classes_are_summed(self):
+        os.environ["CAT_SCORE_THRESHOLD"] = "0.5"
+        self.assertTrue(detection._labels_has_cat(result([281, 0, 151], [0.3, 0.3, 0.25])))
+        self.assertFalse(detection._labels_has_cat(result([281, 0, 1], [0.3, 0.3, 0.25])))
+
+    def test_invalid_threshold_uses_default(self):
+        os.environ["CAT_SCORE_THRESHOLD"] = "high"
+        self.assertEqual(detection.cat_score_threshold(), 0.1)
+
+    def test_out_of_range_ids_fall_back_to_label_text(self):
+        self.assertIsNone(detection._cat_score({"class_ids": [1000], "scores": [0.9]}))
+        self.assertIsNone(detection._cat_score({"class_ids": [-1], "scores": [0.9]}))
+        self.assertTrue(detection._labels_has_cat(result([5000], [0.9], ["Persian cat"])))
+        self.assertFalse(detection._labels_has_cat(result([5001], [0.9], ["tench"])))
+
+    def test_results_without_scores_use_labels(self):
+        self.assertTrue(detection._labels_has_cat([{"label_names": ["tabby, tabby cat"]}]))
+        self.assertFalse(detection._labels_has_cat([{"label_names": ["tench"]}]))
+        self.assertTrue(detection._labels_has_cat([{"class_ids": [9001], "label_names": ["lynx"]}]))
+        mismatched = {"class_ids": [281, 0], "scores": [0.9], "label_names": ["", "siamese cat"]}
+        self.assertIsNone(detection._cat_score(mismatched))
+        self.assertTrue(detection._labels_has_cat([mismatched]))
+        self.assertFalse(detection._labels_has_cat([]))
+
+    def test_class_id_ranges(self):
+        self.assertEqual(detection.parse_class_id_ranges("151-293, 330-338,105,"),
+                         ((151, 293), (330, 338), (105, 105)))
+        lookup = detection.build_class_lookup([(-5, 1), (998, 2000), (10, 10)])
+        self.assertEqual(lookup.size, detection.NUM_CLASSES)
+        self.assertEqual(set(lookup.nonzero()[0]), {0, 1, 10, 998, 999})
+
+        default = detection.build_class_lookup(detection.CAT_CLASS_ID_RANGES)
+        self.assertTrue(default[281] and default[151] and default[388])
+        self.assertFalse(default[0] or default[400] or default[999])
+
+    def test_configured_class_ids_replace_the_defaults(self):
+        # What CAT_CLASS_IDS="0-1" sets up at import
+        detection._CAT_CLASS_LOOKUP = detection.build_class_lookup(detection.parse_class_id_ranges("0-1"))
+        self.assertTrue(detection._labels_has_cat(result([0], [0.9], ["tench"])))
+        self.assertFalse(detection._labels_has_cat(result([281], [0.9], ["tabby"])))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import sys
+import threading
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import database as db
+from temp_db import TempDatabaseTestCase
+
+
+def add_records(count: int, start: datetime, camera_of=lambda i: "cam1"):
+    db.insert_records([
+        db.LogRecord((start + timedelta(minutes=i)).isoformat(), f"{i:06d}.jpg", i % 3 == 0,
+                     None, 100, i % 5 == 0, camera_of(i))
+        for i in range(count)
+    ])
+
+
+def collect_pages(limit: int, between_pages=None, **filters):
+    ids, pages = [], 0
+    before_id = None
+    while True:
+        page = db.query_logs(limit=limit, before_id=before_id, **filters)
+        if not page:
+            return ids, pages
+        ids.extend(row["id"] for row in page)
+        pages += 1
+        before_id = page[-1]["id"]
+        if between_pages:
+            between_pages()
+
+
+class PaginationTests(TempDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.start = datetime(2025, 1, 31, 8, 0)
+        add_records(50, self.start, camera_of=lambda i: "cam1" if i % 2 else "cam2")
+
+    def all_ids(self, where: str = "1", params=()):
+        with db.connection() as conn:
+            rows = conn.execute(f"SELECT id FROM log WHERE {where} ORDER BY id DESC", params).fetchall()
+        return [row[0] for row in rows]
+
+    def test_pages_cover_every_record_once(self):
+        for limit in (1, 7, 10, 50, 80):
+            ids, pages = collect_pages(limit)
+            self.assertEqual(ids, self.all_ids(), limit)
+            self.assertEqual(pages, -(-50 // limit))
+
+    def test_filtered_pages_have_no_duplicates_or_gaps(self):
+        cases = [
+            ({"cat": True}, "cat = 1", ()),
+            ({"too_dark": False}, "too_dark = 0", ()),
+            ({"camera": "cam2", "cat": False}, "camera = ? AND cat = 0", ("cam2",)),
+        ]
+        for filters, where, params in cases:
+            ids, _ = collect_pages(4, **filters)
+            expected = self.all_ids(where, params)
+            self.assertTrue(expected)
+            self.assertEqual(ids, expected, filters)
+
+    def test_time_range_is_inclusive_start_exclusive_end(self):
+        since = (self.start + timedelta(minutes=10)).isoformat()
+        until = (self.start + timedelta(minutes=20)).isoformat()
+        ids, _ = collect_pages(3, since=since, until=until)
+
+        self.assertEqual(len(ids), 10)
+        self.assertEqual(ids, self.all_ids("ts >= ? AND ts < ?", (since, until)))
+
+    def test_rows_inserted_while_paging_do_not_shift_pages(self):
+        expected = self.all_ids()
+        later = self.start + timedelta(days=1)
+        ids, _ = collect_pages(6, between_pages=lambda: add_records(3, later))
+
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(set(ids)), len(ids))
+
+
+class ConnectionPoolTests(TempDatabaseTestCase):
+    def test_pool_keeps_at_most_pool_size_connections(self):
+        barrier = threading.Barrier(db.POOL_SIZE + 2)
+
+        def hold():
+            with db.connection() as conn:
+                conn.execute("SELECT 1").fetchone()
+                barrier.wait(5)
+
+        threads = [threading.Thread(target=hold) for _ in range(db.POOL_SIZE + 2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(db._current_pool().qsize(), db.POOL_SIZE)
+
+    def test_failed_transaction_is_rolled_back_before_reuse(self):
+        with self.assertRaises(RuntimeError):
+            with db.connection() as conn:
+                conn.execute("INSERT INTO settings(name, value) VALUES ('a', '1')")
+                raise RuntimeError("boom")
+
+        self.assertIsNone(db.get_setting("a"))
+        db.set_setting("a", "2")
+        self.assertEqual(db.get_setting("a"), "2")
+
+
+class CounterTests(TempDatabaseTestCase):
+    def test_counter_blocks_do_not_overlap_across_threads(self):
+        starts = []
+        lock = threading.Lock()
+
+        def reserve():
+            for _ in range(20):
+                first = db.reserve_counter_block("image", 8)
+                with lock:
+                    starts.append(first)
+
+        threads = [threading.Thread(target=reserve) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(starts), list(range(1, 8 * 20 * 8, 8)))
+        self.assertEqual(db.next_counter("image"), 8 * 20 * 8 + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
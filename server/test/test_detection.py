@@ -6,7 +6,7 @@ from pathlib import Path
 # Ensure parent directory (server/) is on path so we can import detection.py
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-from detection import paddle_has_cat_from_bytes
+from detection import evict_model, paddle_has_cat_from_bytes
 
 # 测试的模型列表
 MODELS_TO_TEST = [
@@ -105,6 +105,8 @@ if __name__ == "__main__":
                 results.append(result)
         except Exception as e:
             print(f"模型 {model_name} 测试失败: {e}")
+        finally:
+            evict_model(model_name)
     
     # 打印结果汇总
     if results:
@@ -0,0 +1,148 @@
+import sys
+import unittest
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from frame import (
+    THUMB_MAX_SIZE,
+    Frame,
+    calculate_image_brightness,
+    is_image_too_dark,
+    jpeg_dimensions,
+    thumbnail_path,
+)
+
+
+def make_image(height: int, width: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    img = rng.integers(0, 256, (height // 8 + 1, width // 8 + 1, 3), dtype=np.uint8)
+    return cv2.resize(img, (width, height), interpolation=cv2.INTER_LINEAR)
+
+
+def encode_jpeg(img: np.ndarray, progressive: bool = False) -> bytes:
+    params = [cv2.IMWRITE_JPEG_QUALITY, 90, cv2.IMWRITE_JPEG_PROGRESSIVE, int(progressive)]
+    ok, data = cv2.imencode(".jpg", img, params)
+    assert ok
+    return data.tobytes()
+
+
+def with_app_segment(jpeg: bytes, payload: bytes) -> bytes:
+    """Insert an APP1 segment (like EXIF) between SOI and the rest of the file."""
+    segment = b"\xff\xe1" + (len(payload) + 2).to_bytes(2, "big") + payload
+    return jpeg[:2] + segment + jpeg[2:]
+
+
+class JpegDimensionsTests(unittest.TestCase):
+    def test_baseline_jpeg(self):
+        data = encode_jpeg(make_image(240, 320))
+        self.assertIn(b"\xff\xc0", data)
+        self.assertEqual(jpeg_dimensions(data), (240, 320))
+
+    def test_progressive_jpeg(self):
+        data = encode_jpeg(make_image(480, 640), progressive=True)
+        self.assertIn(b"\xff\xc2", data)
+        self.assertNotIn(b"\xff\xc0", data)
+        self.assertEqual(jpeg_dimensions(data), (480, 640))
+
+    def test_segments_before_frame_header_are_skipped(self):
+        # 0xFFC0 inside the skipped payload must not be mistaken for a frame header
+        data = with_app_segment(encode_jpeg(make_image(100, 200)), b"Exif\x00\x00\xff\xc0" + b"\x00" * 40)
+        self.assertEqual(jpeg_dimensions(data), (100, 200))
+
+    def test_truncated_data(self):
+        data = encode_jpeg(make_image(240, 320))
+        sof = data.index(b"\xff\xc0")
+        for cut in (0, 1, 3, 10, sof, sof + 6):
+            self.assertIsNone(jpeg_dimensions(data[:cut]), cut)
+        self.assertEqual(jpeg_dimensions(data[:sof + 10]), (240, 320))
+
+    def test_not_a_jpeg(self):
+        ok, png = cv2.imencode(".png", make_image(10, 10))
+        self.assertIsNone(jpeg_dimensions(png.tobytes()))
+        self.assertIsNone(jpeg_dimensions(b"\xff\xd8" + b"\x00" * 40))
+
+
+class FrameTests(unittest.TestCase):
+    def test_original_policy_keeps_upload_that_fits(self):
+        raw = encode_jpeg(make_image(240, 320), progressive=True)
+        frame = Frame(raw, max_size=320)
+
+        self.assertTrue(frame.fits())
+        self.assertEqual(frame.encode("original"), (raw, ".jpg"))
+        self.assertIsNone(frame._image)  # no decode was needed
+
+    def test_original_policy_resizes_large_upload(self):
+        raw = encode_jpeg(make_image(480, 640))
+        frame = Frame(raw, max_size=320)
+
+        self.assertFalse(frame.fits())
+        data, ext = frame.encode("original")
+        self.assertEqual(ext, ".jpg")
+        self.assertNotEqual(data, raw)
+        self.assertEqual(jpeg_dimensions(data), (240, 320))
+
+    def test_recompressed_and_webp_policies(self):
+        frame = Frame(encode_jpeg(make_image(240, 320)), max_size=320)
+
+        data, ext = frame.encode("recompressed")
+        self.assertEqual(ext, ".jpg")
+        self.assertNotEqual(data, frame.raw)
+        self.assertIs(frame.encode("recompressed")[0], data)  # encoded once
+
+        data, ext = frame.encode("webp")
+        self.assertEqual(ext, ".webp")
+        self.assertEqual(data[:4], b"RIFF")
+        self.assertEqual(data[8:12], b"WEBP")
+
+    def test_unknown_policy_behaves_like_original(self):
+        frame = Frame(encode_jpeg(make_image(100, 100)))
+        self.assertEqual(frame.encode("gif"), (frame.raw, ".jpg"))
+
+    def test_undecodable_upload_is_stored_as_is(self):
+        frame = Frame(b"not an image")
+
+        self.assertIsNone(frame.fits())
+        self.assertIsNone(frame.image)
+        self.assertEqual(frame.encode("webp"), (b"not an image", ".jpg"))
+
+
+class BrightnessTests(unittest.TestCase):
+    def test_brightness_does_not_decode(self):
+        frame = Frame(encode_jpeg(np.full((64, 64, 3), 200, dtype=np.uint8)))
+        self.assertAlmostEqual(frame.brightness(), 200, delta=2)
+        self.assertIsNone(frame._image)
+
+    def test_dark_frame_is_detected_from_reduced_decode(self):
+        dark = encode_jpeg(np.full((480, 640, 3), 10, dtype=np.uint8))
+        self.assertTrue(is_image_too_dark(calculate_image_brightness(dark)))
+        self.assertFalse(is_image_too_dark(calculate_image_brightness(encode_jpeg(make_image(480, 640)))))
+
+    def test_undecodable_upload_counts_as_dark(self):
+        self.assertEqual(Frame(b"not an image").brightness(), 0.0)
+
+
+class ThumbnailTests(unittest.TestCase):
+    def test_thumbnail_size(self):
+        raw = encode_jpeg(make_image(480, 640))
+        decoded = Frame(raw)
+        self.assertIsNotNone(decoded.image)  # thumbnail reuses the decoded 320px image
+        for frame in (Frame(raw), decoded):
+            self.assertEqual(jpeg_dimensions(frame.thumbnail()), (120, THUMB_MAX_SIZE))
+        small = Frame(encode_jpeg(make_image(60, 80)))
+        self.assertEqual(jpeg_dimensions(small.thumbnail()), (30, 40))  # 1/2 scale decode
+
+    def test_undecodable_upload_has_no_thumbnail(self):
+        self.assertIsNone(Frame(b"not an image").thumbnail())
+
+    def test_thumbnail_path(self):
+        self.assertEqual(thumbnail_path("/static/2025/01/31/000001.jpg"), "/static/2025/01/31/000001.thumb.jpg")
+        self.assertEqual(thumbnail_path("2025/01/31/000002.webp"), "2025/01/31/000002.thumb.jpg")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+import sys
+import unittest
+from pathlib import Path
+
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import detection
+import inference
+from fake_engine import FakeEngineTestCase, frame
+
+
+def shared_memory_blocks():
+    try:
+        return {name for name in os.listdir("/dev/shm") if name.startswith("psm_")}
+    except OSError:
+        return set()
+
+
+class BatchInferenceWorkerTests(FakeEngineTestCase):
+    def setUp(self):
+        super().setUp()
+        self.worker = inference.BatchInferenceWorker(max_batch_size=4, max_wait_ms=200)
+
+    def tearDown(self):
+        self.worker.stop()
+        super().tearDown()
+
+    def test_concurrent_frames_are_classified_as_one_batch(self):
+        engine = detection._get_classifier()
+        cats = [True, False, True, False]
+        futures = [self.worker.submit(frame(cat)) for cat in cats]
+
+        self.assertEqual([f.result(5) for f in futures], [(cat, "") for cat in cats])
+        self.assertEqual(engine.batch_sizes, [4])
+
+    def test_batches_are_bounded_by_max_batch_size(self):
+        engine = detection._get_classifier()
+        futures = [self.worker.submit(frame(cat=True)) for _ in range(6)]
+
+        self.assertTrue(all(f.result(5) == (True, "") for f in futures))
+        self.assertEqual(engine.batch_sizes, [4, 2])
+
+    def test_engine_failure_resolves_every_future(self):
+        def broken(engine, model_name):
+            raise RuntimeError("no model")
+
+        detection._create_engine = broken
+        futures = [self.worker.submit(frame(cat=True)) for _ in range(3)]
+        self.assertEqual([f.result(5) for f in futures], [(False, "no model")] * 3)
+
+    def test_stop_finishes_queued_frames(self):
+        futures = [self.worker.submit(frame(cat=False)) for _ in range(5)]
+        self.worker.stop()
+        self.assertTrue(all(f.done() for f in futures))
+        self.assertEqual(futures[-1].result(0), (False, ""))
+
+
+class BatchModeTests(FakeEngineTestCase):
+    env = dict(FakeEngineTestCase.env, INFERENCE_MODE="batch", INFERENCE_TIMEOUT="1")
+
+    def tearDown(self):
+        inference.shutdown()
+        super().tearDown()
+
+    def test_classify_goes_through_the_batch_worker(self):
+        self.assertEqual(inference.classify(frame(cat=True)), (True, ""))
+        self.assertTrue(inference.get_batch_worker()._worker.is_running())
+        self.assertEqual(inference.classify(None), (False, "failed to decode image"))
+
+    def test_slow_inference_times_out(self):
+        self.assertEqual(inference.classify(frame(cat=True, slow=True)), (False, "inference timed out"))
+
+
+# Worker processes only see the patched _create_engine when they are forked
+@unittest.skipUnless(multiprocessing.get_start_method() == "fork", "needs fork start method")
+class ProcessInferencePoolTests(FakeEngineTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pool = inference.ProcessInferencePool(processes=2)
+
+    def tearDown(self):
+        self.pool.stop()
+        super().tearDown()
+
+    def test_frames_round_trip_through_shared_memory(self):
+        before = shared_memory_blocks()
+        self.assertEqual(self.pool.classify(frame(cat=True)), (True, ""))
+        self.assertEqual(self.pool.classify(frame(cat=False)), (False, ""))
+        # Non-contiguous views and other dtypes keep their shape and values
+        self.assertEqual(self.pool.classify(frame(cat=True)[:, ::2]), (True, ""))
+        self.assertEqual(self.pool.classify(frame(cat=True).astype("float32")), (True, ""))
+        self.assertEqual(shared_memory_blocks(), before)
+
+    def test_slow_worker_times_out_and_frees_the_block(self):
+        before = shared_memory_blocks()
+        self.assertEqual(self.pool.classify(frame(cat=True, slow=True), timeout=0.5),
+                         (False, "inference timed out"))
+        self.assertEqual(shared_memory_blocks(), before)
+        self.assertEqual(self.pool.classify(frame(cat=True)), (True, ""))
+
+    def test_stop_terminates_workers(self):
+        self.pool.start()
+        workers = list(self.pool._pool._pool)
+        self.pool.stop()
+        self.assertTrue(all(not worker.is_alive() for worker in workers))
+
+
+@unittest.skipUnless(multiprocessing.get_start_method() == "fork", "needs fork start method")
+class ProcessModeTests(FakeEngineTestCase):
+    env = dict(FakeEngineTestCase.env, INFERENCE_MODE="process", INFERENCE_WORKERS="1")
+
+    def tearDown(self):
+        inference.shutdown()
+        inference._process_pool = None
+        super().tearDown()
+
+    def test_classify_goes_through_the_process_pool(self):
+        self.assertEqual(inference.inference_mode(), "process")
+        self.assertEqual(inference.classify(frame(cat=True)), (True, ""))
+        self.assertEqual(inference.get_process_pool().processes, 1)
+        # Loaded in the worker process, not in this one
+        self.assertEqual(detection.loaded_models(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import detection
+from fake_engine import FakeEngine, FakeEngineTestCase, frame
+
+
+class ModelCacheTests(FakeEngineTestCase):
+    env = dict(FakeEngineTestCase.env, PADDLECLAS_MAX_MODELS="2")
+
+    def test_model_is_loaded_once(self):
+        for _ in range(3):
+            self.assertEqual(detection.paddle_has_cat_from_array(frame(cat=True)), (True, ""))
+        self.assertEqual(FakeEngine.created, ["FakeNet"])
+        self.assertEqual(detection.loaded_models(), ["paddle:FakeNet"])
+
+    def test_concurrent_first_use_loads_once(self):
+        threads = [threading.Thread(target=detection.paddle_has_cat_from_array, args=(frame(cat=True),))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(FakeEngine.created, ["FakeNet"])
+
+    def test_least_recently_used_model_is_evicted(self):
+        detection.paddle_has_cat_from_array(frame(cat=True), "A")
+        detection.paddle_has_cat_from_array(frame(cat=True), "B")
+        detection.paddle_has_cat_from_array(frame(cat=True), "A")  # B is now least recent
+        detection.paddle_has_cat_from_array(frame(cat=True), "C")
+
+        self.assertEqual(detection.loaded_models(), ["paddle:A", "paddle:C"])
+        detection.paddle_has_cat_from_array(frame(cat=True), "B")
+        self.assertEqual(FakeEngine.created, ["A", "B", "C", "B"])
+
+    def test_evict_model(self):
+        detection.warm_up()
+        detection.paddle_has_cat_from_array(frame(cat=True), "Other")
+
+        self.assertTrue(detection.evict_model())
+        self.assertFalse(detection.evict_model())
+        self.assertEqual(detection.loaded_models(), ["paddle:Other"])
+        self.assertTrue(detection.evict_model("Other"))
+        self.assertEqual(detection.loaded_models(), [])
+
+    def test_engine_errors_are_reported_not_raised(self):
+        def broken(engine, model_name):
+            raise RuntimeError("model download failed")
+
+        detection._create_engine = broken
+        self.assertEqual(detection.paddle_has_cat_from_array(frame(cat=True)), (False, "model download failed"))
+        self.assertEqual(detection.paddle_has_cat_from_array(None), (False, "failed to decode image"))
+        self.assertEqual(detection.loaded_models(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import detection
+
+
+class ResolvePrecisionTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.model = str(self.tmp / "model.onnx")
+        Path(self.model).write_bytes(b"float model")
+        Path(detection.quantized_model_path(self.model)).write_bytes(b"int8 model")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def write_gate(self, **entries):
+        gate = {
+            "model": self.model,
+            "model_sha256": detection.model_digest(self.model),
+            "fp16": {"accepted": True},
+            "int8": {"accepted": True, "sha256": detection.model_digest(detection.quantized_model_path(self.model))},
+        }
+        gate.update(entries)
+        with open(detection.quantization_gate_path(self.model), "w", encoding="utf-8") as f:
+            json.dump(gate, f)
+
+    def test_gate_paths(self):
+        self.assertEqual(detection.quantized_model_path("/m/model.onnx"), "/m/model.int8.onnx")
+        self.assertEqual(detection.quantization_gate_path("/m/model.onnx"), "/m/model.quant.json")
+
+    def test_fp32_needs_no_gate(self):
+        self.assertEqual(detection.resolve_precision(self.model, "fp32"), "fp32")
+
+    def test_accepted_precisions_are_used(self):
+        self.write_gate()
+        self.assertEqual(detection.resolve_precision(self.model, "fp16"), "fp16")
+        self.assertEqual(detection.resolve_precision(self.model, "int8"), "int8")
+
+    def test_missing_or_unreadable_gate_falls_back_to_fp32(self):
+        self.assertEqual(detection.resolve_precision(self.model, "int8"), "fp32")
+        Path(detection.quantization_gate_path(self.model)).write_text("{not json", encoding="utf-8")
+        self.assertEqual(detection.resolve_precision(self.model, "fp16"), "fp32")
+        Path(detection.quantization_gate_path(self.model)).write_text("[]", encoding="utf-8")
+        self.assertEqual(detection.resolve_precision(self.model, "fp16"), "fp32")
+
+    def test_rejected_precision_falls_back_to_fp32(self):
+        self.write_gate(fp16={"accepted": False, "delta": -0.2}, int8={"accepted": False, "error": "boom"})
+        self.assertEqual(detection.resolve_precision(self.model, "fp16"), "fp32")
+        self.assertEqual(detection.resolve_precision(self.model, "int8"), "fp32")
+
+    def test_gate_for_another_model_is_ignored(self):
+        self.write_gate()
+        Path(self.model).write_bytes(b"re-exported float model")
+        self.assertEqual(detection.read_quantization_gate(self.model), {})
+        self.assertEqual(detection.resolve_precision(self.model, "fp16"), "fp32")
+
+    def test_gate_without_hash_is_ignored(self):
+        self.write_gate(model_sha256=None)
+        self.assertEqual(detection.resolve_precision(self.model, "fp16"), "fp32")
+
+    def test_changed_or_missing_int8_model_falls_back_to_fp32(self):
+        self.write_gate()
+        Path(detection.quantized_model_path(self.model)).write_bytes(b"recalibrated int8 model")
+        self.assertEqual(detection.resolve_precision(self.model, "int8"), "fp32")
+        self.assertEqual(detection.resolve_precision(self.model, "fp16"), "fp16")
+
+        os.remove(detection.quantized_model_path(self.model))
+        self.assertEqual(detection.resolve_precision(self.model, "int8"), "fp32")
+
+    def test_model_digest(self):
+        self.assertEqual(detection.model_digest(self.model), detection.model_digest(self.model))
+        self.assertEqual(len(detection.model_digest(self.model)), 64)
+        self.assertIsNone(detection.model_digest(str(self.tmp / "missing.onnx")))
+
+
+class PrecisionSettingTests(unittest.TestCase):
+    def setUp(self):
+        self._original_env = {name: os.environ.get(name) for name in ("DETECTION_PRECISION", "DETECTION_ENGINE")}
+
+    def tearDown(self):
+        for name, value in self._original_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+    def test_precision_setting(self):
+        os.environ["DETECTION_PRECISION"] = " INT8 "
+        self.assertEqual(detection.detection_precision(), "int8")
+        os.environ["DETECTION_PRECISION"] = "int4"
+        self.assertEqual(detection.detection_precision(), "fp32")
+
+    def test_each_precision_is_cached_separately(self):
+        os.environ["DETECTION_ENGINE"] = "opencv"
+        os.environ["DETECTION_PRECISION"] = "fp16"
+        self.assertEqual(detection._cache_key("model.onnx"), "opencv:model.onnx:fp16")
+        os.environ["DETECTION_ENGINE"] = "paddle"
+        self.assertEqual(detection._cache_key("EfficientNetB0"), "paddle:EfficientNetB0")
+
+
+if __name__ == "__main__":
+    unittest.main()
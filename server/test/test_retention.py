@@ -0,0 +1,155 @@
+import sys
+import unittest
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import database as db
+from retention import RetentionJob, RetentionPolicy
+from storage import ImageStore
+from temp_db import TempDatabaseTestCase
+
+
+class RetentionTestCase(TempDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = ImageStore(self.tmp / "static", id_block_size=4)
+
+    def add_record(self, when: datetime, cat: bool = False, size: int = 100) -> str:
+        """Write an image file (and thumbnail) for `when` and insert its row."""
+        image_path = self.store.new_image_path(".jpg", when)
+        path = self.store.path_for(image_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+        path.with_name(path.stem + ".thumb.jpg").write_bytes(b"t")
+        db.insert_records([db.LogRecord(when.isoformat(), image_path, cat, None, size)])
+        return image_path
+
+    def remaining_ids(self):
+        return sorted(row["id"] for row in db.query_logs(limit=1000))
+
+
+def _policy(**limits) -> RetentionPolicy:
+    limits.setdefault("disk_budget_mb", None)
+    return RetentionPolicy(**limits)
+
+
+class RetentionBoundaryTests(RetentionTestCase):
+    def setUp(self):
+        super().setUp()
+        now = datetime.now()
+        self.paths = [self.add_record(now - timedelta(minutes=10 - i)) for i in range(10)]
+
+    def test_keep_last_keeps_exactly_the_newest_records(self):
+        job = RetentionJob(_policy(keep_last=3), self.store)
+
+        self.assertEqual(job.run_once(), 7)
+        self.assertEqual(self.remaining_ids(), [8, 9, 10])
+        self.assertEqual(job.deleted_files, 7)
+        self.assertFalse(self.store.path_for(self.paths[6]).exists())
+        self.assertFalse(self.store.path_for(self.paths[6]).with_name("000007.thumb.jpg").exists())
+        self.assertTrue(self.store.path_for(self.paths[7]).exists())
+
+    def test_keep_last_at_or_above_row_count_deletes_nothing(self):
+        for keep_last in (10, 11):
+            job = RetentionJob(_policy(keep_last=keep_last), self.store)
+            self.assertEqual(job.run_once(), 0)
+        self.assertEqual(len(self.remaining_ids()), 10)
+
+    def test_disk_budget_keeps_newest_images_that_fit(self):
+        # 100 bytes per image: 250 bytes fit the two newest, exactly 300 fit three
+        job = RetentionJob(_policy(disk_budget_mb=250 / (1024 * 1024)), self.store)
+        self.assertEqual(job.boundary_id(), 9)
+        job.run_once()
+        self.assertEqual(self.remaining_ids(), [9, 10])
+
+        job = RetentionJob(_policy(disk_budget_mb=300 / (1024 * 1024)), self.store)
+        self.assertEqual(job.boundary_id(), None)
+
+    def test_strictest_limit_wins(self):
+        job = RetentionJob(_policy(keep_last=5, disk_budget_mb=250 / (1024 * 1024)), self.store)
+        self.assertEqual(job.boundary_id(), 9)
+
+    def test_no_limits_deletes_nothing(self):
+        job = RetentionJob(_policy(), self.store)
+        self.assertIsNone(job.boundary_id())
+        self.assertEqual(job.run_once(), 0)
+        self.assertEqual(len(self.remaining_ids()), 10)
+
+    def test_recent_cat_detections_are_spared(self):
+        self.add_record(datetime.now() - timedelta(days=30), cat=True)
+        recent_cat = self.add_record(datetime.now() - timedelta(hours=1), cat=True)
+        for _ in range(3):
+            self.add_record(datetime.now())
+
+        job = RetentionJob(_policy(keep_last=2, keep_positives_days=7), self.store)
+        job.run_once()
+
+        remaining = {row["image_path"] for row in db.query_logs(limit=1000)}
+        self.assertEqual(len(remaining), 3)
+        self.assertIn(recent_cat, remaining)
+        self.assertTrue(self.store.path_for(recent_cat).exists())
+
+
+class RetentionDayDirectoryTests(RetentionTestCase):
+    def test_emptied_old_day_is_removed_in_one_go(self):
+        old = datetime.now() - timedelta(days=10)
+        for _ in range(3):
+            self.add_record(old)
+        self.add_record(datetime.now())
+
+        job = RetentionJob(_policy(keep_last=1), self.store)
+        job.run_once()
+
+        self.assertEqual(job.deleted_days, 1)
+        self.assertEqual(job.deleted_files, 3)
+        self.assertFalse(self.store.day_dir(old.date()).exists())
+        self.assertEqual(self.store.days(), [date.today()])
+
+    def test_today_and_yesterday_are_never_removed(self):
+        today = datetime.now()
+        yesterday = today - timedelta(days=1)
+        self.add_record(yesterday)
+        self.add_record(today)
+        # Files the writer has written but whose rows are not inserted yet
+        for when in (yesterday, today):
+            pending = self.store.path_for(self.store.new_image_path(".jpg", when))
+            pending.write_bytes(b"pending")
+        self.add_record(today)
+
+        job = RetentionJob(_policy(keep_last=1), self.store)
+        job.run_once()
+
+        self.assertEqual(job.deleted_days, 0)
+        self.assertEqual(self.store.days(), [yesterday.date(), today.date()])
+        self.assertEqual(len(list(self.store.day_dir(yesterday.date()).glob("*.jpg"))), 1)
+
+    def test_day_older_than_oldest_record_is_removed(self):
+        leftover = self.store.day_dir(date.today() - timedelta(days=20))
+        leftover.mkdir(parents=True)
+        (leftover / "000001.jpg").write_bytes(b"orphan")
+        self.add_record(datetime.now() - timedelta(days=5))
+
+        job = RetentionJob(_policy(), self.store)
+        job.run_once()
+
+        self.assertFalse(leftover.exists())
+        self.assertEqual(self.store.days(), [date.today() - timedelta(days=5)])
+
+    def test_day_with_remaining_records_is_kept(self):
+        old = datetime.now() - timedelta(days=10)
+        first = self.add_record(old)
+        kept = [self.add_record(old + timedelta(minutes=i)) for i in range(1, 3)]
+
+        job = RetentionJob(_policy(keep_last=2), self.store)
+        job.run_once()
+
+        self.assertEqual(job.deleted_days, 0)
+        self.assertFalse(self.store.path_for(first).exists())
+        self.assertTrue(all(self.store.path_for(p).exists() for p in kept))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import sys
+import unittest
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from scene_cache import SceneChangeCache, compute_signature, hamming_distance
+
+
+def make_image(height: int, width: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    img = rng.integers(0, 256, (height // 8 + 1, width // 8 + 1, 3), dtype=np.uint8)
+    return cv2.resize(img, (width, height), interpolation=cv2.INTER_LINEAR)
+
+
+class SceneChangeCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.img = make_image(240, 320, seed=1)
+        self.signature = compute_signature(self.img)
+
+    def test_unchanged_scene_reuses_verdict(self):
+        cache = SceneChangeCache()
+        self.assertIsNone(cache.lookup("cam", self.signature))
+        cache.update("cam", self.signature, (True, ""))
+
+        noisy = cv2.add(self.img, np.full_like(self.img, 2))
+        self.assertEqual(cache.lookup("cam", compute_signature(noisy)), (True, ""))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_changed_scene_or_other_camera_misses(self):
+        cache = SceneChangeCache()
+        cache.update("cam", self.signature, (False, ""))
+
+        self.assertIsNone(cache.lookup("cam", compute_signature(make_image(240, 320, seed=2))))
+        self.assertIsNone(cache.lookup("other", self.signature))
+
+    def test_failed_classification_is_not_cached(self):
+        cache = SceneChangeCache()
+        cache.update("cam", self.signature, (False, ""))
+        cache.update("cam", self.signature, (False, "model error"))
+        self.assertIsNone(cache.lookup("cam", self.signature))
+
+    def test_expired_entry_misses(self):
+        cache = SceneChangeCache(max_age=-1)
+        cache.update("cam", self.signature, (True, ""))
+        self.assertIsNone(cache.lookup("cam", self.signature))
+
+    def test_oldest_camera_is_evicted(self):
+        cache = SceneChangeCache(max_cameras=2)
+        for camera in ("a", "b", "c"):
+            cache.update(camera, self.signature, (True, ""))
+
+        self.assertIsNone(cache.lookup("a", self.signature))
+        self.assertEqual(cache.lookup("c", self.signature), (True, ""))
+        self.assertEqual(cache.stats()["cameras"], 2)
+
+
+    def test_signature_ignores_overall_brightness(self):
+        brighter = cv2.add(self.img, np.full_like(self.img, 30))
+        self.assertLessEqual(hamming_distance(self.signature.phash, compute_signature(brighter).phash), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
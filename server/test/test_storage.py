@@ -0,0 +1,39 @@
+import sys
+import unittest
+from datetime import date, datetime
+from pathlib import Path
+
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from storage import ImageStore
+from temp_db import TempDatabaseTestCase
+
+
+class ImageStoreTests(TempDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = ImageStore(self.tmp / "static", id_block_size=4)
+
+    def test_ids_are_reserved_in_blocks_and_never_repeat(self):
+        when = datetime(2025, 1, 31, 12, 0)
+        first = [self.store.new_image_path(".jpg", when) for _ in range(6)]
+        other = ImageStore(self.store.root, id_block_size=4)
+        second = [other.new_image_path(".jpg", when) for _ in range(2)]
+
+        self.assertEqual(first[0], "2025/01/31/000001.jpg")
+        self.assertEqual(first[-1], "2025/01/31/000006.jpg")
+        self.assertEqual(second, ["2025/01/31/000009.jpg", "2025/01/31/000010.jpg"])
+
+    def test_legacy_urls_and_unsafe_paths(self):
+        self.assertEqual(self.store.url_for("2025/01/31/000001.jpg"), "/static/2025/01/31/000001.jpg")
+        self.assertEqual(self.store.url_for("/static/000001.jpg"), "/static/000001.jpg")
+        self.assertEqual(self.store.path_for("/static/000001.jpg"), self.store.root / "000001.jpg")
+        self.assertIsNone(self.store.path_for("/elsewhere/000001.jpg"))
+        self.assertIsNone(self.store.path_for("../detect.db"))
+        self.assertIsNone(self.store.day_of("/static/000001.jpg"))
+        self.assertEqual(self.store.day_of("2025/01/31/000001.jpg"), date(2025, 1, 31))
+
+
+if __name__ == "__main__":
+    unittest.main()
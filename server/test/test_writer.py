@@ -0,0 +1,117 @@
+import sys
+import threading
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import database as db
+from frame import Frame, thumbnail_path
+from temp_db import TempDatabaseTestCase
+from storage import ImageStore
+from writer import PersistenceWriter, PersistJob
+
+
+def make_frame(height: int = 240, width: int = 320) -> Frame:
+    img = np.zeros((height, width, 3), dtype=np.uint8)
+    cv2.circle(img, (width // 2, height // 2), min(height, width) // 3, (40, 180, 220), -1)
+    ok, data = cv2.imencode(".jpg", img)
+    assert ok
+    return Frame(data.tobytes())
+
+
+class BlockingImageStore(ImageStore):
+    """Holds the writer thread inside its first write until `release` is set."""
+
+    def __init__(self, root: Path):
+        super().__init__(root)
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def new_image_path(self, ext, now=None):
+        if threading.current_thread().name == "persistence-writer" and not self.entered.is_set():
+            self.entered.set()
+            self.release.wait(5)
+        return super().new_image_path(ext, now)
+
+
+class FailingImageStore(ImageStore):
+    def new_image_path(self, ext, now=None):
+        raise OSError("disk full")
+
+
+class PersistenceWriterTests(TempDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = self.tmp / "static"
+
+    @staticmethod
+    def job(frame: Frame, **kwargs) -> PersistJob:
+        kwargs.setdefault("ts", datetime(2025, 1, 31, 12, 0).isoformat())
+        return PersistJob(frame=frame, cat=True, message="ok", **kwargs)
+
+    def test_queued_jobs_are_written_with_thumbnails(self):
+        store = ImageStore(self.root)
+        writer = PersistenceWriter(store, max_queue=8)
+        for _ in range(5):
+            writer.submit(self.job(make_frame(), camera="cam1"))
+        writer.stop()
+
+        rows = db.query_logs(limit=10)
+        self.assertEqual(len(rows), 5)
+        for row in rows:
+            path = store.path_for(row["image_path"])
+            self.assertEqual(path.stat().st_size, row["image_size"])
+            self.assertTrue(Path(thumbnail_path(str(path))).exists())
+            self.assertEqual(row["camera"], "cam1")
+        self.assertEqual(writer.stats()["written"], 5)
+        self.assertEqual(writer.stats()["overflows"], 0)
+
+    def test_full_queue_writes_synchronously_instead_of_dropping(self):
+        store = BlockingImageStore(self.root)
+        writer = PersistenceWriter(store, max_queue=1)
+        writer.submit(self.job(make_frame()))
+        self.assertTrue(store.entered.wait(5))  # the thread holds the first job
+        writer.submit(self.job(make_frame()))  # fills the queue
+        writer.submit(self.job(make_frame()))  # overflows: written by this thread
+
+        self.assertEqual(writer.stats()["overflows"], 1)
+        self.assertEqual(len(db.query_logs(limit=10)), 1)
+        store.release.set()
+        writer.stop()
+
+        rows = db.query_logs(limit=10)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(len({row["image_path"] for row in rows}), 3)
+        self.assertEqual(writer.stats()["written"], 3)
+        self.assertEqual(writer.stats()["queue_depth"], 0)
+
+    def test_storage_policy_is_applied_in_the_writer(self):
+        store = ImageStore(self.root)
+        writer = PersistenceWriter(store)
+        writer.submit(self.job(make_frame(480, 640), policy="webp"))
+        writer.stop()
+
+        row = db.query_logs(limit=1)[0]
+        self.assertTrue(row["image_path"].endswith(".webp"))
+        img = cv2.imread(str(store.path_for(row["image_path"])))
+        self.assertEqual(img.shape[:2], (240, 320))
+
+    def test_failed_image_write_still_records_the_detection(self):
+        writer = PersistenceWriter(FailingImageStore(self.root))
+        writer.submit(self.job(make_frame()))
+        writer.stop()
+
+        row = db.query_logs(limit=1)[0]
+        self.assertEqual(row["image_path"], "")
+        self.assertEqual(row["error"], "disk full | ok")
+        self.assertEqual(writer.stats()["failed"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
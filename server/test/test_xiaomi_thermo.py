@@ -1,5 +1,9 @@
 import json
+import os
 import sys
+import tempfile
+import threading
+import time
 import unittest
 from pathlib import Path
 
@@ -134,6 +138,196 @@ class FakeCloudInterfaceMiot:
         return {thermometer.did: thermometer}
 
 
+class CountingMiCloudClient(FakeMiCloudRpcClient):
+    def __init__(self):
+        self.endpoints = []
+        self.logins = 0
+        self.rejected = False  # the cloud rejects the token: micloud answers None
+        self.login_works = True
+
+    def login(self):
+        self.logins += 1
+        self.rejected = not self.login_works
+        return self.login_works
+
+    def request_country(self, endpoint, country, params):
+        self.endpoints.append(endpoint)
+        if self.rejected:
+            return None
+        return super().request_country(endpoint, country, params)
+
+
+class CountingCloudInterface(FakeCloudInterfaceRpc):
+    instances = []
+    fail_next_get_devices = 0
+
+    def __init__(self, username, password):
+        super().__init__(username, password)
+        self._micloud = CountingMiCloudClient()
+        self.device_calls = 0
+        CountingCloudInterface.instances.append(self)
+
+    def get_devices(self, locale=None):
+        self.device_calls += 1
+        if CountingCloudInterface.fail_next_get_devices:
+            CountingCloudInterface.fail_next_get_devices -= 1
+            raise xt.CloudException("token expired")
+        return super().get_devices(locale)
+
+
+class SlowMiCloudClient(FakeMiCloudRpcClient):
+    delay = 0.2
+    stuck_did = None
+
+    def __init__(self):
+        # Shared by the per-thread copies the service makes of this client
+        self.calls = {"active": 0, "max_active": 0}
+        self._lock = threading.Lock()
+
+    def request_country(self, endpoint, country, params):
+        if endpoint.startswith("/home/rpc/"):
+            with self._lock:
+                self.calls["active"] += 1
+                self.calls["max_active"] = max(self.calls["max_active"], self.calls["active"])
+            try:
+                stuck = endpoint == f"/home/rpc/{SlowMiCloudClient.stuck_did}"
+                time.sleep(2 if stuck else SlowMiCloudClient.delay)
+            finally:
+                with self._lock:
+                    self.calls["active"] -= 1
+        return super().request_country(endpoint, country, params)
+
+
+class SlowCloudInterface(FakeCloudInterfaceRpc):
+    device_count = 6
+
+    def __init__(self, username, password):
+        super().__init__(username, password)
+        self._micloud = SlowMiCloudClient()
+
+    def get_devices(self, locale=None):
+        _ = locale
+        devices = [
+            build_device(
+                did=f"did-{index}",
+                name=f"Sensor {index}",
+                model="lumi.sensor_ht",
+                desc="Hall",
+            )
+            for index in range(SlowCloudInterface.device_count)
+        ]
+        return {device.did: device for device in devices}
+
+
+class BulkMiotClient:
+    """Answers /miotspec/prop/get from a (did, siid, piid) -> value table."""
+
+    def __init__(self, values, fail_calls=(), with_did=True):
+        self.values = values
+        self.fail_calls = set(fail_calls)
+        self.with_did = with_did  # False: answer like devices that leave out the did
+        self.miot_requests = []
+        self.rpc_requests = []
+
+    def request_country(self, endpoint, country, params):
+        _ = country
+        payload = json.loads(params["data"])
+        if endpoint.startswith("/home/rpc/"):
+            self.rpc_requests.append(payload["params"])
+            return json.dumps({"code": -1, "message": "unsupported"})
+        if endpoint == "/miotspec/prop/get":
+            self.miot_requests.append(payload["params"])
+            if len(self.miot_requests) in self.fail_calls:
+                return None
+            result = []
+            for item in payload["params"]:
+                key = (item["did"], item["siid"], item["piid"])
+                entry = {"siid": item["siid"], "piid": item["piid"]}
+                if self.with_did:
+                    entry["did"] = item["did"]
+                if key in self.values:
+                    entry.update(code=0, value=self.values[key])
+                else:
+                    entry["code"] = -704030013  # property does not exist
+                result.append(entry)
+            return json.dumps({"code": 0, "result": result})
+        return json.dumps({"result": {}})
+
+
+class SlowMiotClient(BulkMiotClient):
+    """BulkMiotClient whose per-device MIoT requests are slow, or hang for stuck_did."""
+
+    def __init__(self, values, delay, stuck_did=None, **kwargs):
+        super().__init__(values, **kwargs)
+        self.delay = delay
+        self.stuck_did = stuck_did
+        self.calls = {"active": 0, "max_active": 0}  # shared with the per-thread copies
+        self.lock = threading.Lock()
+
+    def request_country(self, endpoint, country, params):
+        if endpoint != "/miotspec/prop/get":
+            return super().request_country(endpoint, country, params)
+        dids = {item["did"] for item in json.loads(params["data"])["params"]}
+        if len(dids) != 1:
+            return super().request_country(endpoint, country, params)
+        with self.lock:
+            self.calls["active"] += 1
+            self.calls["max_active"] = max(self.calls["max_active"], self.calls["active"])
+        try:
+            time.sleep(60 if dids == {self.stuck_did} else self.delay)
+            return super().request_country(endpoint, country, params)
+        finally:
+            with self.lock:
+                self.calls["active"] -= 1
+
+
+class LastQueryRpcClient(FakeMiCloudRpcClient):
+    """Answers get_prop only for the last of the RPC property queries."""
+
+    def __init__(self):
+        self.queries = []
+
+    def request_country(self, endpoint, country, params):
+        if endpoint.startswith("/home/rpc/"):
+            query = json.loads(params["data"])["params"]
+            self.queries.append(query)
+            if query != ["temp", "hum"]:
+                return json.dumps({"code": 0, "result": [None, None]})
+        return super().request_country(endpoint, country, params)
+
+
+class LastQueryCloudInterface(FakeCloudInterfaceRpc):
+    client = None
+
+    def __init__(self, username, password):
+        super().__init__(username, password)
+        self._micloud = LastQueryCloudInterface.client
+
+
+class BulkMiotCloudInterface:
+    client = None
+    dids = ()
+    models = {}
+
+    def __init__(self, username, password):
+        _ = username
+        _ = password
+        self._micloud = BulkMiotCloudInterface.client
+
+    def get_devices(self, locale=None):
+        _ = locale
+        devices = [
+            build_device(
+                did=did,
+                name=f"Sensor {did}",
+                model=BulkMiotCloudInterface.models.get(did, "miaomiaoce.sensor_ht.t1"),
+                desc="Hall",
+            )
+            for did in BulkMiotCloudInterface.dids
+        ]
+        return {device.did: device for device in devices}
+
+
 class XiaomiThermoServiceTests(unittest.TestCase):
     def setUp(self):
         self._original_cloud_interface = xt.CloudInterface
@@ -174,5 +368,486 @@ class XiaomiThermoServiceTests(unittest.TestCase):
         self.assertAlmostEqual(item["humidity"], 54.0)
 
 
+class XiaomiThermoSessionTests(unittest.TestCase):
+    def setUp(self):
+        self._original_cloud_interface = xt.CloudInterface
+        xt.CloudInterface = CountingCloudInterface
+        CountingCloudInterface.instances = []
+        CountingCloudInterface.fail_next_get_devices = 0
+
+    def tearDown(self):
+        xt.CloudInterface = self._original_cloud_interface
+
+    def test_session_and_lookups_are_reused(self):
+        service = xt.XiaomiThermoService(username="user", password="pass")
+
+        first = service.get_house_readings()
+        second = service.get_house_readings()
+
+        self.assertEqual(first["items"], second["items"])
+        self.assertEqual(len(CountingCloudInterface.instances), 1)
+        session = CountingCloudInterface.instances[0]
+        self.assertEqual(session._micloud.logins, 0)
+        self.assertEqual(session.device_calls, 1)
+        self.assertEqual(session._micloud.endpoints.count("/v2/homeroom/gethome"), 1)
+
+    def test_expired_device_cache_is_refetched_on_same_session(self):
+        service = xt.XiaomiThermoService(username="user", password="pass", devices_ttl=0)
+
+        service.get_house_readings()
+        service.get_house_readings()
+
+        self.assertEqual(len(CountingCloudInterface.instances), 1)
+        self.assertEqual(CountingCloudInterface.instances[0].device_calls, 2)
+
+    def test_logs_in_again_after_auth_failure(self):
+        service = xt.XiaomiThermoService(username="user", password="pass")
+        CountingCloudInterface.fail_next_get_devices = 1
+
+        payload = service.get_house_readings()
+
+        self.assertEqual(payload["count"], 1)
+        self.assertEqual(len(CountingCloudInterface.instances), 2)
+
+    def test_logs_in_again_after_token_is_rejected(self):
+        service = xt.XiaomiThermoService(username="user", password="pass")
+        service.get_house_readings()
+        micloud_client = CountingCloudInterface.instances[0]._micloud
+        micloud_client.rejected = True
+
+        # Read again within the same refresh instead of publishing nulls
+        payload = service.get_house_readings()
+
+        self.assertEqual(micloud_client.logins, 1)
+        self.assertEqual(len(CountingCloudInterface.instances), 1)
+        self.assertAlmostEqual(payload["items"][0]["temperature"], 23.1)
+
+    def test_refresh_fails_while_token_stays_rejected(self):
+        service = xt.XiaomiThermoService(username="user", password="pass")
+        poller = xt.ThermoPoller(service, interval=3600)
+        poller.refresh()
+        micloud_client = CountingCloudInterface.instances[0]._micloud
+        micloud_client.rejected = True
+        micloud_client.login = lambda: True  # login "works" but the token is still refused
+
+        with self.assertRaises(RuntimeError):
+            service.get_house_readings()
+        snapshot = poller.refresh()
+
+        self.assertAlmostEqual(snapshot.items[0]["temperature"], 23.1)
+        self.assertIsInstance(poller.last_error, RuntimeError)
+        self.assertTrue(poller.is_stale(snapshot))
+
+    def test_new_session_when_login_again_fails(self):
+        service = xt.XiaomiThermoService(username="user", password="pass")
+        service.get_house_readings()
+        micloud_client = CountingCloudInterface.instances[0]._micloud
+        micloud_client.rejected = True
+        micloud_client.login_works = False
+        service.get_house_readings()
+
+        payload = service.get_house_readings()
+
+        self.assertEqual(len(CountingCloudInterface.instances), 2)
+        self.assertEqual(CountingCloudInterface.instances[1].device_calls, 1)
+        self.assertAlmostEqual(payload["items"][0]["temperature"], 23.1)
+
+    def test_get_service_returns_shared_instance(self):
+        original = xt._shared_service
+        xt._shared_service = None
+        try:
+            self.assertIs(xt.get_service(), xt.get_service())
+        finally:
+            xt._shared_service = original
+
+
+class ConcurrentReadTests(unittest.TestCase):
+    def setUp(self):
+        self._original_cloud_interface = xt.CloudInterface
+        xt.CloudInterface = SlowCloudInterface
+        SlowMiCloudClient.stuck_did = None
+
+    def tearDown(self):
+        xt.CloudInterface = self._original_cloud_interface
+        SlowMiCloudClient.stuck_did = None
+
+    def test_devices_are_read_concurrently(self):
+        service = xt.XiaomiThermoService(username="user", password="pass", fetch_workers=8)
+
+        start = time.monotonic()
+        payload = service.get_house_readings()
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(payload["count"], SlowCloudInterface.device_count)
+        self.assertTrue(all(item["temperature"] == 23.1 for item in payload["items"]))
+        # Serial reads would take device_count * delay = 1.2 s
+        self.assertLess(elapsed, 0.8)
+        self.assertGreater(service._session()._micloud.calls["max_active"], 1)
+
+    def test_pool_size_bounds_concurrency(self):
+        service = xt.XiaomiThermoService(username="user", password="pass", fetch_workers=2)
+
+        service.get_house_readings()
+
+        self.assertLessEqual(service._session()._micloud.calls["max_active"], 2)
+
+    def test_slow_device_times_out_without_blocking_others(self):
+        SlowMiCloudClient.stuck_did = "did-3"
+        service = xt.XiaomiThermoService(
+            username="user", password="pass", device_timeout=0.5, refresh_deadline=2
+        )
+
+        start = time.monotonic()
+        payload = service.get_house_readings()
+        elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, 2)
+        by_did = {item["did"]: item for item in payload["items"]}
+        self.assertIsNone(by_did["did-3"]["temperature"])
+        self.assertTrue(by_did["did-3"]["stale"])
+        self.assertAlmostEqual(by_did["did-0"]["temperature"], 23.1)
+        self.assertFalse(by_did["did-0"]["stale"])
+        # The abandoned read must not keep the interpreter from exiting
+        readers = [t for t in threading.enumerate() if t.name.startswith("miio-read")]
+        self.assertTrue(readers)
+        self.assertTrue(all(t.daemon for t in readers))
+
+
+class BulkMiotTests(unittest.TestCase):
+    def setUp(self):
+        self._original_cloud_interface = xt.CloudInterface
+        xt.CloudInterface = BulkMiotCloudInterface
+        BulkMiotCloudInterface.dids = ("did-a", "did-b", "did-c")
+        BulkMiotCloudInterface.models = {"did-b": "miaomiaoce.sensor_ht.t2"}
+        self.values = {
+            ("did-a", 2, 1): 21.0,
+            ("did-a", 2, 2): 40,
+            ("did-b", 3, 1): 19.5,  # only answers the second candidate
+            ("did-b", 3, 2): 55,
+            ("did-c", 2, 1): 2350,  # raw value in 1/100 degrees
+            ("did-c", 2, 2): 61,
+        }
+
+    def tearDown(self):
+        xt.CloudInterface = self._original_cloud_interface
+
+    def readings(self, **kwargs):
+        service = xt.XiaomiThermoService(username="user", password="pass", **kwargs)
+        payload = service.get_house_readings()
+        return {item["did"]: (item["temperature"], item["humidity"]) for item in payload["items"]}
+
+    def test_one_request_for_all_devices(self):
+        BulkMiotCloudInterface.client = BulkMiotClient(self.values)
+
+        readings = self.readings()
+
+        self.assertEqual(len(BulkMiotCloudInterface.client.miot_requests), 1)
+        self.assertEqual(readings["did-a"], (21.0, 40.0))
+        self.assertEqual(readings["did-b"], (19.5, 55.0))
+        self.assertEqual(readings["did-c"], (23.5, 61.0))
+
+    def test_requests_are_chunked(self):
+        BulkMiotCloudInterface.client = BulkMiotClient(self.values)
+
+        readings = self.readings(miot_batch_size=4)
+
+        requests = BulkMiotCloudInterface.client.miot_requests
+        self.assertEqual(len(requests), 5)  # 3 devices x 6 candidate properties
+        self.assertTrue(all(len(chunk) <= 4 for chunk in requests))
+        self.assertEqual(readings["did-b"], (19.5, 55.0))
+
+    def test_failed_chunk_falls_back_to_per_device_requests(self):
+        BulkMiotCloudInterface.client = BulkMiotClient(self.values, fail_calls={1})
+
+        readings = self.readings()
+
+        self.assertEqual(readings["did-a"], (21.0, 40.0))
+        self.assertEqual(readings["did-b"], (19.5, 55.0))
+        self.assertGreater(len(BulkMiotCloudInterface.client.miot_requests), 1)
+
+    def test_answer_without_did_falls_back_to_per_device_requests(self):
+        BulkMiotCloudInterface.client = BulkMiotClient(self.values, with_did=False)
+
+        readings = self.readings()
+
+        requests = BulkMiotCloudInterface.client.miot_requests
+        self.assertGreater(len(requests), 1)
+        self.assertTrue(all(len(chunk) == 2 for chunk in requests[1:]))
+        self.assertEqual(readings["did-a"], (21.0, 40.0))
+        self.assertEqual(readings["did-b"], (19.5, 55.0))
+        self.assertEqual(readings["did-c"], (23.5, 61.0))
+
+    def test_devices_missing_from_answer_are_read_one_by_one(self):
+        client = BulkMiotClient(self.values)
+        answer = client.request_country
+
+        def drop_did_c(endpoint, country, params):
+            response = answer(endpoint, country, params)
+            if endpoint != "/miotspec/prop/get" or len(client.miot_requests) > 1:
+                return response
+            payload = json.loads(response)
+            payload["result"] = [i for i in payload["result"] if i["did"] != "did-c"]
+            return json.dumps(payload)
+
+        client.request_country = drop_did_c
+        BulkMiotCloudInterface.client = client
+
+        readings = self.readings()
+
+        self.assertEqual(readings["did-c"], (23.5, 61.0))
+        self.assertTrue(all(item["did"] == "did-c" for item in client.miot_requests[1]))
+
+    def test_fallback_reads_run_concurrently(self):
+        client = SlowMiotClient(self.values, delay=0.3, with_did=False)
+        BulkMiotCloudInterface.client = client
+
+        start = time.monotonic()
+        readings = self.readings(fetch_workers=8)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(readings["did-c"], (23.5, 61.0))
+        # Serial fallback would take 4 requests x 0.3 s (did-b needs two candidates)
+        self.assertLess(elapsed, 1.0)
+        self.assertGreater(client.calls["max_active"], 1)
+
+    def test_stuck_fallback_read_times_out_without_blocking_others(self):
+        client = SlowMiotClient(self.values, delay=0, stuck_did="did-b", with_did=False)
+        BulkMiotCloudInterface.client = client
+        service = xt.XiaomiThermoService(
+            username="user", password="pass", device_timeout=0.5, refresh_deadline=2
+        )
+
+        start = time.monotonic()
+        payload = service.get_house_readings()
+        elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, 1.5)
+        by_did = {item["did"]: item for item in payload["items"]}
+        self.assertTrue(by_did["did-b"]["stale"])
+        self.assertIsNone(by_did["did-b"]["temperature"])
+        self.assertEqual((by_did["did-a"]["temperature"], by_did["did-a"]["humidity"]), (21.0, 40.0))
+        self.assertFalse(by_did["did-c"]["stale"])
+
+    def test_bulk_mode_can_be_disabled(self):
+        BulkMiotCloudInterface.client = BulkMiotClient(self.values)
+
+        readings = self.readings(miot_batch_size=0)
+
+        # One request per tried candidate: a, c hit the first one, b the second
+        self.assertEqual(len(BulkMiotCloudInterface.client.miot_requests), 4)
+        self.assertEqual(readings["did-c"], (23.5, 61.0))
+
+
+class StrategyCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._original_cloud_interface = xt.CloudInterface
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = str(Path(self._tmp.name) / "strategies.json")
+        BulkMiotCloudInterface.dids = ("did-a", "did-b")
+        BulkMiotCloudInterface.models = {}
+
+    def tearDown(self):
+        xt.CloudInterface = self._original_cloud_interface
+        self._tmp.cleanup()
+
+    def service(self, **kwargs):
+        return xt.XiaomiThermoService(
+            username="user", password="pass", strategies=xt.StrategyCache(self.path), **kwargs
+        )
+
+    def test_learned_miot_model_skips_get_prop(self):
+        xt.CloudInterface = BulkMiotCloudInterface
+        BulkMiotCloudInterface.client = BulkMiotClient(
+            {("did-a", 3, 1): 21.0, ("did-a", 3, 2): 40, ("did-b", 3, 1): 22.0, ("did-b", 3, 2): 45}
+        )
+        service = self.service()
+        service.get_house_readings()
+        self.assertGreater(len(BulkMiotCloudInterface.client.rpc_requests), 0)
+
+        BulkMiotCloudInterface.client.rpc_requests.clear()
+        payload = service.get_house_readings()
+
+        self.assertEqual(BulkMiotCloudInterface.client.rpc_requests, [])
+        self.assertEqual(payload["items"][0]["temperature"], 21.0)
+
+    def test_learned_strategy_is_persisted(self):
+        xt.CloudInterface = BulkMiotCloudInterface
+        BulkMiotCloudInterface.dids = ("did-a",)
+        BulkMiotCloudInterface.client = BulkMiotClient(
+            {("did-a", 3, 1): 21.0, ("did-a", 3, 2): 40}
+        )
+        self.service().get_house_readings()
+
+        self.assertEqual(xt.StrategyCache(self.path).get("miaomiaoce.sensor_ht.t1"), "miot:3.1,3.2")
+
+        # A fresh process with the same file tries the learned candidate only
+        BulkMiotCloudInterface.client = BulkMiotClient(
+            {("did-a", 3, 1): 21.0, ("did-a", 3, 2): 40}
+        )
+        self.service(miot_batch_size=0).get_house_readings()
+        client = BulkMiotCloudInterface.client
+        self.assertEqual(client.rpc_requests, [])
+        self.assertEqual(client.miot_requests[0][0]["siid"], 3)
+
+    def test_failing_strategy_is_forgotten(self):
+        xt.CloudInterface = BulkMiotCloudInterface
+        xt.StrategyCache(self.path).record("miaomiaoce.sensor_ht.t1", "miot:3.7,3.8")
+        BulkMiotCloudInterface.client = BulkMiotClient(
+            {("did-a", 2, 1): 21.0, ("did-a", 2, 2): 40}
+        )
+
+        payload = self.service().get_house_readings()
+
+        self.assertEqual(payload["items"][0]["temperature"], 21.0)
+        self.assertEqual(xt.StrategyCache(self.path).get("miaomiaoce.sensor_ht.t1"), "miot:2.1,2.2")
+
+    def test_learned_rpc_query_is_tried_first(self):
+        xt.CloudInterface = LastQueryCloudInterface
+        LastQueryCloudInterface.client = LastQueryRpcClient()
+        service = self.service()
+        service.get_house_readings()
+        self.assertEqual(len(LastQueryCloudInterface.client.queries), 3)
+
+        LastQueryCloudInterface.client.queries.clear()
+        payload = service.get_house_readings()
+
+        self.assertEqual(LastQueryCloudInterface.client.queries, [["temp", "hum"]])
+        self.assertEqual(payload["items"][0]["temperature"], 23.1)
+
+    def test_unreadable_cache_file_is_ignored(self):
+        Path(self.path).write_text("not json", encoding="utf-8")
+
+        cache = xt.StrategyCache(self.path)
+        cache.record("lumi.sensor_ht", "rpc:temp,hum")
+
+        self.assertEqual(xt.StrategyCache(self.path).get("lumi.sensor_ht"), "rpc:temp,hum")
+
+    def test_workers_save_through_their_own_temp_file(self):
+        # Another worker's half-written temp file must not be touched
+        other_tmp = Path(f"{self.path}.{os.getpid() + 1}.tmp")
+        other_tmp.write_text("{", encoding="utf-8")
+
+        xt.StrategyCache(self.path).record("lumi.sensor_ht", "rpc:temp,hum")
+
+        self.assertEqual(other_tmp.read_text(encoding="utf-8"), "{")
+        self.assertEqual(sorted(p.name for p in Path(self._tmp.name).iterdir()),
+                         sorted([other_tmp.name, "strategies.json"]))
+        self.assertEqual(xt.StrategyCache(self.path).get("lumi.sensor_ht"), "rpc:temp,hum")
+
+
+class FakeReadingsService:
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self.timed_out = set()  # dids reported without values, like a read that timed out
+
+    def get_house_readings(self):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("cloud unavailable")
+        stale = "did-thermo" in self.timed_out
+        return {
+            "count": 1,
+            "updated_at": f"refresh-{self.calls}",
+            "items": [{
+                "did": "did-thermo",
+                "temperature": None if stale else 21.5,
+                "humidity": None if stale else 40.0,
+                "stale": stale,
+            }],
+        }
+
+
+class ThermoPollerTests(unittest.TestCase):
+    def setUp(self):
+        self.service = FakeReadingsService()
+        self.poller = xt.ThermoPoller(self.service, interval=3600)
+
+    def tearDown(self):
+        self.poller.stop()
+
+    def test_serves_snapshot_without_new_cloud_calls(self):
+        first, error = self.poller.get()
+        second, _ = self.poller.get()
+
+        self.assertIsNone(error)
+        self.assertIs(first, second)
+        self.assertEqual(self.service.calls, 1)
+        self.assertEqual(first.to_dict()["items"][0]["temperature"], 21.5)
+        self.assertFalse(self.poller.is_stale(first))
+
+    def test_snapshot_is_immutable(self):
+        snapshot, _ = self.poller.get()
+        with self.assertRaises(TypeError):
+            snapshot.items[0]["temperature"] = 0
+        payload = snapshot.to_dict()
+        payload["items"][0]["temperature"] = 0
+        self.assertEqual(snapshot.items[0]["temperature"], 21.5)
+
+    def test_keeps_last_snapshot_when_refresh_fails(self):
+        snapshot, _ = self.poller.get()
+        self.service.fail = True
+
+        self.poller.refresh()
+        stale, error = self.poller.get()
+
+        self.assertIs(stale, snapshot)
+        self.assertIsInstance(error, RuntimeError)
+        self.assertTrue(self.poller.is_stale(stale))
+
+        self.service.fail = False
+        fresh = self.poller.refresh()
+        self.assertEqual(fresh.updated_at, f"refresh-{self.service.calls}")
+        self.assertIsNone(self.poller.last_error)
+
+    def test_keeps_last_values_of_devices_that_timed_out(self):
+        first = self.poller.refresh()
+        self.service.timed_out = {"did-thermo"}
+
+        second = self.poller.refresh()
+
+        self.assertIsNot(second, first)
+        self.assertEqual(second.items[0]["temperature"], 21.5)
+        self.assertTrue(second.items[0]["stale"])
+        self.assertIsNone(self.poller.last_error)
+
+    def test_timed_out_device_without_earlier_values_stays_empty(self):
+        self.service.timed_out = {"did-thermo"}
+
+        snapshot = self.poller.refresh()
+
+        self.assertIsNone(snapshot.items[0]["temperature"])
+
+    def test_whole_refresh_timing_out_keeps_last_snapshot(self):
+        original = xt.CloudInterface
+        xt.CloudInterface = SlowCloudInterface
+        SlowCloudInterface.device_count = 1
+        try:
+            service = xt.XiaomiThermoService(
+                username="user", password="pass", device_timeout=0.3, refresh_deadline=0.5
+            )
+            poller = xt.ThermoPoller(service, interval=3600)
+            first = poller.refresh()
+            SlowMiCloudClient.stuck_did = "did-0"
+
+            second = poller.refresh()
+        finally:
+            xt.CloudInterface = original
+            SlowCloudInterface.device_count = 6
+            SlowMiCloudClient.stuck_did = None
+
+        self.assertIs(second, first)
+        self.assertIsInstance(poller.last_error, RuntimeError)
+        self.assertTrue(poller.is_stale(second))
+
+    def test_reports_error_before_first_snapshot(self):
+        self.service.fail = True
+
+        snapshot, error = self.poller.get()
+
+        self.assertIsNone(snapshot)
+        self.assertIsInstance(error, RuntimeError)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,122 @@
+import queue
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import database as db
+from background import BackgroundWorker
+from frame import Frame, thumbnail_path
+from storage import ImageStore
+
+
+@dataclass
+class PersistJob:
+    frame: Frame  # owned by the writer once submitted: encoded and thumbnailed there
+    cat: bool
+    message: str
+    ts: str
+    too_dark: bool = False
+    camera: Optional[str] = None
+    policy: str = "original"  # storage policy, see Frame.encode
+
+
+class PersistenceWriter:
+    """
+    Bounded write-behind queue for detection images and log rows. A background
+    thread encodes the queued frames, writes them with their thumbnails and inserts
+    their rows in one transaction per batch, so /detect only waits for
+    classification. When the queue is full the caller writes synchronously instead
+    of dropping anything.
+    """
+
+    def __init__(self, store: ImageStore, max_queue: int = 256, max_batch: int = 32):
+        self.store = store
+        self.max_batch = max(1, max_batch)
+        self._worker = BackgroundWorker("persistence-writer", self._run, max_queue=max(1, max_queue))
+        self._stats_lock = threading.Lock()  # batches may also be written by request threads
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.overflows = 0
+
+    def submit(self, job: PersistJob) -> None:
+        self._worker.ensure_started()
+        try:
+            self._worker.queue.put_nowait(job)
+        except queue.Full:
+            with self._stats_lock:
+                self.overflows += 1
+            self._write_batch([job])
+
+    def queue_depth(self) -> int:
+        return self._worker.queue.qsize()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush everything still queued and stop the background thread."""
+        self._worker.stop(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue_depth(),
+            "queue_size": self._worker.max_queue,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "overflows": self.overflows,
+        }
+
+    def _run(self) -> None:
+        while True:
+            batch, stopping = self._worker.next_batch(self.max_batch)
+            if batch:
+                self._write_batch(batch)
+            if stopping:
+                return
+
+    @staticmethod
+    def _write_thumbnail(path: Path, frame: Frame) -> None:
+        # A missing thumbnail only means /log falls back to the full image
+        thumb_data = frame.thumbnail()
+        if not thumb_data:
+            return
+        try:
+            with open(thumbnail_path(str(path)), "wb") as f:
+                f.write(thumb_data)
+        except OSError as e:
+            print(f"Failed to write thumbnail for {path}: {e}")
+
+    def _write_batch(self, batch: List[PersistJob]) -> None:
+        records = []
+        failed = 0
+        for job in batch:
+            message = job.message
+            image_path = ""
+            size = 0
+            try:
+                data, ext = job.frame.encode(job.policy)
+                image_path = self.store.new_image_path(ext, datetime.fromisoformat(job.ts))
+                path = self.store.path_for(image_path)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(data)
+                size = len(data)
+                self._write_thumbnail(path, job.frame)
+            except Exception as e:
+                failed += 1
+                size = 0
+                message = f"{e} | {message}" if message else str(e)
+            records.append(db.LogRecord(job.ts, image_path, job.cat, message, size,
+                                        job.too_dark, job.camera))
+        try:
+            db.insert_records(records)
+            written = len(records)
+        except Exception as e:
+            written = 0
+            failed = len(records)
+            print(f"Failed to insert {len(records)} log records: {e}")
+        with self._stats_lock:
+            self.written += written
+            self.failed += failed
+            self.batches += 1
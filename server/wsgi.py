@@ -0,0 +1,46 @@
+"""
+生产环境入口（替代 app.run 的开发服务器）
+
+  waitress，单进程多线程，Windows / Linux 都可用:
+      python wsgi.py
+  gunicorn，多进程（Linux），每个 worker 在 fork 后由 post_fork 各自加载模型:
+      gunicorn -c gunicorn.conf.py wsgi:app
+
+Shared state lives in SQLite (image ID counter, brightness toggle), so every
+thread and worker process sees the same values.
+"""
+
+import os
+import signal
+
+from app import app, shutdown, start_background_jobs, warm_up_model
+
+
+def _raise_keyboard_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def serve():
+    """Serve with waitress until SIGINT / SIGTERM, then flush pending writes."""
+    from waitress import serve as waitress_serve
+
+    warm_up_model()
+    start_background_jobs()
+    # docker stop / systemd send SIGTERM; handle it like Ctrl+C so shutdown() runs
+    signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+    try:
+        waitress_serve(
+            app,
+            host=os.getenv("HOST", "0.0.0.0"),
+            port=int(os.getenv("PORT", "8099")),
+            threads=int(os.getenv("WEB_THREADS", "8")),
+        )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Shutting down, flushing pending writes...")
+        shutdown()
+
+
+if __name__ == "__main__":
+    serve()
@@ -1,15 +1,45 @@
+import copy
 import json
 import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
 
 from miio.cloud import CloudDeviceInfo, CloudException, CloudInterface
 
+from background import BackgroundWorker
+
 
 DEFAULT_COUNTRY = "de"
 DEFAULT_ROOM_NAME = "Unassigned"
 
+# Seconds the device list and the room names are reused before asking the cloud again
+DEFAULT_DEVICES_TTL = 300.0
+DEFAULT_ROOMS_TTL = 3600.0
+
+# Devices are read concurrently; one device may take DEFAULT_DEVICE_TIMEOUT seconds
+# and a whole refresh DEFAULT_REFRESH_DEADLINE seconds
+DEFAULT_FETCH_WORKERS = 8
+DEFAULT_DEVICE_TIMEOUT = 10.0
+DEFAULT_REFRESH_DEADLINE = 20.0
+
+# Properties per /miotspec/prop/get request when reading all devices in bulk
+# (0 = one request per device and candidate)
+DEFAULT_MIOT_BATCH_SIZE = 60
+
+# model -> read strategy that last worked, kept across restarts (see StrategyCache)
+DEFAULT_STRATEGY_CACHE_FILE = "miio_strategies.json"
+
+# Background refresh of the readings served by /api/thermometers
+DEFAULT_POLL_INTERVAL = 60.0
+DEFAULT_POLL_IDLE_TIMEOUT = 600.0  # stop polling when nobody asked for this long
+
 THERMOMETER_MODEL_HINTS = (
     "sensor_ht",
     "weather",
@@ -40,6 +70,7 @@ class ThermometerReading:
     temperature: Optional[float]
     humidity: Optional[float]
     online: bool
+    stale: bool = False  # not read in this refresh (timed out); the poller keeps the last values
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -50,6 +81,7 @@ class ThermometerReading:
             "temperature": self.temperature,
             "humidity": self.humidity,
             "online": self.online,
+            "stale": self.stale,
         }
 
 
@@ -103,6 +135,163 @@ def _normalize_humidity(value: Any) -> Optional[float]:
     return round(numeric, 1)
 
 
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    expires_at: float
+
+    def fresh(self) -> bool:
+        return time.monotonic() < self.expires_at
+
+
+def _rpc_strategy(query: Tuple[str, str]) -> str:
+    return "rpc:" + ",".join(query)
+
+
+def _miot_strategy(candidate: Tuple[Tuple[int, int], Tuple[int, int]]) -> str:
+    return "miot:" + ",".join(f"{siid}.{piid}" for siid, piid in candidate)
+
+
+def _run_on_daemon_threads(fn, items: List[Any], workers: int) -> List[Future]:
+    """
+    fn(item) for every item on up to `workers` daemon threads, one future per item.
+    Not a ThreadPoolExecutor: concurrent.futures joins its threads at interpreter
+    exit, so a read stuck in micloud would hold up shutdown and worker recycling.
+    """
+    pending: "queue.Queue[Tuple[Any, Future]]" = queue.Queue()
+    futures = []
+    for item in items:
+        future: Future = Future()
+        futures.append(future)
+        pending.put((item, future))
+
+    def work() -> None:
+        while True:
+            try:
+                item, future = pending.get_nowait()
+            except queue.Empty:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(item))
+            except BaseException as exc:
+                future.set_exception(exc)
+
+    for index in range(min(max(1, workers), len(futures))):
+        threading.Thread(target=work, name=f"miio-read-{index}", daemon=True).start()
+    return futures
+
+
+def _fill_missing(
+    values: Tuple[Optional[float], Optional[float]],
+    fallback: Tuple[Optional[float], Optional[float]],
+) -> Tuple[Optional[float], Optional[float]]:
+    """(temperature, humidity), taking each missing value from fallback."""
+    return tuple(  # type: ignore[return-value]
+        value if value is not None else other for value, other in zip(values, fallback)
+    )
+
+
+def _learned_first(items: Iterable[Any], strategy_of, learned: Optional[str]) -> List[Any]:
+    """items in their usual order, except that the learned strategy is tried first."""
+    items = list(items)
+    return sorted(items, key=lambda item: strategy_of(item) != learned)
+
+
+class StrategyCache:
+    """
+    Remembers per device model which read strategy last returned values, e.g.
+    "rpc:temp,hum" or "miot:3.1,3.2", so later refreshes try it first instead of
+    walking every candidate. When the learned strategy stops answering, the next
+    one that does replaces it; a device that answers nothing (offline) leaves the
+    entry alone. Persisted as JSON when a path is given; every gunicorn worker
+    keeps its own copy and saves through its own temp file, the last save wins.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._strategies: Dict[str, str] = self._load()
+
+    def _load(self) -> Dict[str, str]:
+        if not self.path:
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as exc:
+            print(f"Ignoring unreadable strategy cache {self.path}: {exc}")
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return {str(model): str(strategy) for model, strategy in data.items()}
+
+    def get(self, model: Optional[str]) -> Optional[str]:
+        if not model:
+            return None
+        with self._lock:
+            return self._strategies.get(model)
+
+    def record(self, model: Optional[str], strategy: str) -> None:
+        if not model:
+            return
+        with self._lock:
+            if self._strategies.get(model) == strategy:
+                return
+            self._strategies[model] = strategy
+            self._save()
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"  # workers may save at the same time
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._strategies, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError as exc:
+            print(f"Failed to save strategy cache {self.path}: {exc}")
+
+
+@dataclass(frozen=True)
+class ReadingsSnapshot:
+    """One published refresh result. Replaced as a whole by the poller, never modified."""
+
+    count: int
+    updated_at: str
+    items: Tuple[Mapping[str, Any], ...]
+    fetched_at: float  # time.monotonic() of the refresh
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "ReadingsSnapshot":
+        return cls(
+            count=payload["count"],
+            updated_at=payload["updated_at"],
+            items=tuple(MappingProxyType(dict(item)) for item in payload["items"]),
+            fetched_at=time.monotonic(),
+        )
+
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "updated_at": self.updated_at,
+            "items": [dict(item) for item in self.items],
+        }
+
+
 def _first_non_empty(*values: Any) -> Optional[str]:
     for value in values:
         if value is None:
@@ -120,6 +309,13 @@ class XiaomiThermoService:
         password: str,
         country: str = DEFAULT_COUNTRY,
         model_hints: Optional[Iterable[str]] = None,
+        devices_ttl: float = DEFAULT_DEVICES_TTL,
+        rooms_ttl: float = DEFAULT_ROOMS_TTL,
+        fetch_workers: int = DEFAULT_FETCH_WORKERS,
+        device_timeout: float = DEFAULT_DEVICE_TIMEOUT,
+        refresh_deadline: float = DEFAULT_REFRESH_DEADLINE,
+        miot_batch_size: int = DEFAULT_MIOT_BATCH_SIZE,
+        strategies: Optional[StrategyCache] = None,
     ):
         self.username = username.strip()
         self.password = password.strip()
@@ -130,6 +326,19 @@ class XiaomiThermoService:
             hints.update(item.strip().lower() for item in model_hints if item.strip())
         self.model_hints = tuple(sorted(hints))
 
+        self.devices_ttl = devices_ttl
+        self.rooms_ttl = rooms_ttl
+        self.fetch_workers = max(1, fetch_workers)
+        self.device_timeout = device_timeout
+        self.refresh_deadline = refresh_deadline
+        self.miot_batch_size = max(0, miot_batch_size)
+        self.strategies = strategies if strategies is not None else StrategyCache()
+        self._lock = threading.RLock()
+        self._cloud_interface: Optional[CloudInterface] = None
+        self._session_stale = False  # a cloud request failed, log in again before the next refresh
+        self._devices: Optional[_CacheEntry] = None
+        self._rooms: Optional[_CacheEntry] = None
+
     @classmethod
     def from_env(cls) -> "XiaomiThermoService":
         raw_hints = os.getenv("MIIO_SENSOR_MODELS", "")
@@ -139,33 +348,44 @@ class XiaomiThermoService:
             password=os.getenv("MIIO_PASSWORD", ""),
             country=os.getenv("MIIO_COUNTRY", DEFAULT_COUNTRY),
             model_hints=hint_list,
+            devices_ttl=_env_float("MIIO_DEVICES_TTL", DEFAULT_DEVICES_TTL),
+            rooms_ttl=_env_float("MIIO_ROOMS_TTL", DEFAULT_ROOMS_TTL),
+            fetch_workers=int(_env_float("MIIO_FETCH_WORKERS", DEFAULT_FETCH_WORKERS)),
+            device_timeout=_env_float("MIIO_DEVICE_TIMEOUT", DEFAULT_DEVICE_TIMEOUT),
+            refresh_deadline=_env_float("MIIO_REFRESH_DEADLINE", DEFAULT_REFRESH_DEADLINE),
+            miot_batch_size=int(_env_float("MIIO_MIOT_BATCH_SIZE", DEFAULT_MIOT_BATCH_SIZE)),
+            strategies=StrategyCache(
+                os.getenv("MIIO_STRATEGY_CACHE", DEFAULT_STRATEGY_CACHE_FILE) or None
+            ),
         )
 
     def get_house_readings(self) -> Dict[str, Any]:
         if not self.username or not self.password:
             raise ValueError("MIIO_USERNAME and MIIO_PASSWORD are required.")
 
-        cloud_interface = CloudInterface(username=self.username, password=self.password)
-
-        try:
-            devices = cloud_interface.get_devices(locale=self.country)
-        except CloudException as exc:
-            raise RuntimeError(f"Failed to fetch device list from Xiaomi cloud: {exc}") from exc
-
-        micloud_client = getattr(cloud_interface, "_micloud", None)
-        if micloud_client is None:
-            raise RuntimeError("Could not initialize Xiaomi cloud client.")
-
-        device_list = list(devices.values())
-        room_lookup = self._build_room_lookup(micloud_client)
+        for attempt in range(2):
+            self._session()  # logs in again first if a request was rejected
+            device_list = self._get_devices()
+            micloud_client = getattr(self._session(), "_micloud", None)
+            if micloud_client is None:
+                raise RuntimeError("Could not initialize Xiaomi cloud client.")
+
+            room_lookup = self._get_room_lookup(micloud_client)
+            thermometers = [device for device in device_list if self._is_thermometer(device)]
+            values = self._read_all_sensor_values(micloud_client, thermometers)
+            if not self._session_stale:
+                break
+            # The cloud rejected the token partway through: the missing values would be
+            # published as nulls, so log in again and read once more, or fail the refresh
+            if attempt:
+                raise RuntimeError("Xiaomi cloud rejected the session while reading thermometers")
+        if thermometers and not values:
+            raise RuntimeError("No thermometer answered within the refresh deadline")
 
         readings: List[ThermometerReading] = []
-        for device in device_list:
-            if not self._is_thermometer(device):
-                continue
-
+        for device in thermometers:
             room_name = self._resolve_room(device, room_lookup)
-            temperature, humidity = self._read_sensor_values(micloud_client, device)
+            temperature, humidity = values.get(device.did, (None, None))
             online = self._read_online_state(device)
 
             readings.append(
@@ -177,6 +397,7 @@ class XiaomiThermoService:
                     temperature=temperature,
                     humidity=humidity,
                     online=online,
+                    stale=device.did not in values,
                 )
             )
 
@@ -188,6 +409,76 @@ class XiaomiThermoService:
             "items": [item.to_dict() for item in readings],
         }
 
+    def _session(self) -> CloudInterface:
+        """
+        The cloud interface, kept for the lifetime of the service. python-miio logs a
+        new one in on its first get_devices(), so the device list is fetched again
+        for it. After a cloud request failed the micloud client logs in again with
+        its public login(); if that fails too the interface is replaced.
+        """
+        with self._lock:
+            if self._cloud_interface is not None and self._session_stale:
+                self._session_stale = False
+                if not self._login_again(getattr(self._cloud_interface, "_micloud", None)):
+                    self._cloud_interface = None
+            if self._cloud_interface is None:
+                self._cloud_interface = CloudInterface(
+                    username=self.username, password=self.password
+                )
+                self._session_stale = False
+                self._devices = None
+            return self._cloud_interface
+
+    @staticmethod
+    def _login_again(micloud_client: Any) -> bool:
+        try:
+            return bool(micloud_client is not None and micloud_client.login())
+        except Exception as exc:
+            print(f"Failed to log in to Xiaomi cloud again: {exc}")
+            return False
+
+    def reset_session(self) -> None:
+        """Drop the cloud session so the next call logs in again."""
+        with self._lock:
+            self._cloud_interface = None
+
+    def _get_devices(self) -> List[CloudDeviceInfo]:
+        with self._lock:
+            cached = self._cloud_interface is not None and self._devices is not None
+            if cached and self._devices.fresh():
+                return self._devices.value
+
+        for attempt in range(2):
+            cloud_interface = self._session()
+            try:
+                devices = cloud_interface.get_devices(locale=self.country)
+                break
+            # micloud returns None instead of a list once its token is rejected,
+            # which CloudInterface surfaces as a TypeError
+            except (CloudException, TypeError) as exc:
+                # Log in again and retry once before giving up
+                self.reset_session()
+                if attempt:
+                    raise RuntimeError(
+                        f"Failed to fetch device list from Xiaomi cloud: {exc}"
+                    ) from exc
+
+        device_list = list(devices.values())
+        with self._lock:
+            self._devices = _CacheEntry(device_list, time.monotonic() + self.devices_ttl)
+        return device_list
+
+    def _get_room_lookup(self, micloud_client: Any) -> Dict[str, str]:
+        with self._lock:
+            if self._rooms is not None and self._rooms.fresh():
+                return self._rooms.value
+
+        room_lookup = self._build_room_lookup(micloud_client)
+        if room_lookup:  # an empty result is usually a failed request, retry next time
+            with self._lock:
+                self._rooms = _CacheEntry(room_lookup, time.monotonic() + self.rooms_ttl)
+        return room_lookup
+
     def _is_thermometer(self, device: CloudDeviceInfo) -> bool:
         model = (device.model or "").lower()
         if any(hint in model for hint in self.model_hints):
@@ -288,70 +579,216 @@ class XiaomiThermoService:
 
         return room_lookup
 
+    def _read_all_sensor_values(
+        self, micloud_client: Any, devices: List[CloudDeviceInfo]
+    ) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+        """
+        Read all devices concurrently, so a refresh takes about one device's round
+        trips instead of the sum. A device gets device_timeout seconds from the start
+        of its reads and the refresh as a whole refresh_deadline; devices that miss
+        them are left out of the result. micloud has no HTTP timeout, so a hung
+        request is abandoned on its daemon thread rather than cancelled.
+        """
+        if not devices:
+            return {}
+
+        # In bulk mode the MIoT fallback runs once for all devices afterwards
+        bulk_miot = self.miot_batch_size > 0
+        skipped_rpc = {device.did for device in devices if self._learned_miot(device.model)}
+        models = {device.did: device.model for device in devices}
+
+        def read(device: CloudDeviceInfo) -> Tuple[Optional[float], Optional[float]]:
+            client = self._thread_client(micloud_client)
+            return self._read_sensor_values(client, device, use_miot=not bulk_miot)
+
+        deadline = time.monotonic() + self.refresh_deadline
+        results = self._run_with_deadline(
+            read, devices, deadline, lambda device: f"{device.did} ({device.model})"
+        )
+        values = {devices[index].did: result for index, result in results.items()}
+
+        if bulk_miot:
+            missing = [
+                did for did, (temp, humidity) in values.items() if temp is None or humidity is None
+            ]
+            bulk_values = self._read_values_with_miot_spec_bulk(
+                micloud_client, missing, models, deadline
+            )
+            for did in missing:
+                if did not in bulk_values:
+                    del values[did]  # its MIoT read timed out, report it as not read
+                    continue
+                values[did] = _fill_missing(values[did], bulk_values[did])
+
+            # The learned MIoT strategy did not answer: try get_prop as well
+            unanswered = [
+                did for did in missing
+                if did in skipped_rpc and did in values and None in values[did]
+            ]
+
+            def read_rpc(did: str) -> Tuple[Optional[float], Optional[float]]:
+                client = self._thread_client(micloud_client)
+                return self._read_values_with_rpc(client, did, models[did])
+
+            rpc_values = self._run_with_deadline(read_rpc, unanswered, deadline, str)
+            for index, rpc in rpc_values.items():
+                did = unanswered[index]
+                values[did] = _fill_missing(values[did], rpc)
+        return values
+
+    def _run_with_deadline(
+        self, fn, items: List[Any], deadline: float, describe
+    ) -> Dict[int, Any]:
+        """
+        fn(item) for every item on daemon threads. Each call gets device_timeout
+        seconds from its start and all of them end at `deadline` (time.monotonic());
+        calls that miss them or raise are logged and left out. Returns results by index.
+        """
+        if not items:
+            return {}
+        started: Dict[int, float] = {}
+
+        def run(indexed: Tuple[int, Any]) -> Any:
+            index, item = indexed
+            started[index] = time.monotonic()
+            return fn(item)
+
+        futures = _run_on_daemon_threads(run, list(enumerate(items)), self.fetch_workers)
+        results: Dict[int, Any] = {}
+        try:
+            for index, future in enumerate(futures):
+                while True:
+                    limit = deadline
+                    if index in started:
+                        limit = min(limit, started[index] + self.device_timeout)
+                    wait = limit - time.monotonic()
+                    if index not in started:
+                        wait = min(wait, 0.1)  # queued behind other calls, re-check soon
+                    try:
+                        results[index] = future.result(timeout=max(0.0, wait))
+                    except FutureTimeoutError:
+                        if time.monotonic() < limit:
+                            continue
+                        print(f"Timed out reading {describe(items[index])} from Xiaomi cloud")
+                    except Exception as exc:
+                        print(f"Failed to read {describe(items[index])} from Xiaomi cloud: {exc}")
+                    break
+        finally:
+            for future in futures:
+                future.cancel()  # calls not started yet once the deadline has passed
+        return results
+
+    @staticmethod
+    def _thread_client(micloud_client: Any) -> Any:
+        """
+        Shallow copy of the logged-in micloud client for one worker thread. MiCloud
+        replaces self.session on every request, so threads must not share one instance;
+        the copies share the login (token, ssecurity) but each gets its own session.
+        """
+        client = copy.copy(micloud_client)
+        if hasattr(client, "session"):
+            client.session = None
+        return client
+
     def _read_sensor_values(
-        self, micloud_client: Any, device: CloudDeviceInfo
+        self, micloud_client: Any, device: CloudDeviceInfo, use_miot: bool = True
     ) -> Tuple[Optional[float], Optional[float]]:
         raw = self._raw(device)
         raw_temp, raw_humidity = self._extract_raw_values(raw)
         temperature = _normalize_temperature(raw_temp)
         humidity = _normalize_humidity(raw_humidity)
+        if temperature is not None and humidity is not None:
+            return temperature, humidity
 
-        rpc_temp, rpc_humidity = self._read_values_with_rpc(micloud_client, device.did)
-        if temperature is None:
-            temperature = rpc_temp
-        if humidity is None:
-            humidity = rpc_humidity
+        # Models known to answer MIoT reads skip the get_prop round trips
+        miot_learned = self._learned_miot(device.model)
+        if not miot_learned:
+            rpc_temp, rpc_humidity = self._read_values_with_rpc(
+                micloud_client, device.did, device.model
+            )
+            if temperature is None:
+                temperature = rpc_temp
+            if humidity is None:
+                humidity = rpc_humidity
 
-        if temperature is not None and humidity is not None:
+        if (temperature is not None and humidity is not None) or not use_miot:
             return temperature, humidity
 
         miot_temp, miot_humidity = self._read_values_with_miot_spec(
-            micloud_client, device.did
+            micloud_client, device.did, device.model
         )
         if temperature is None:
             temperature = miot_temp
         if humidity is None:
             humidity = miot_humidity
 
+        if miot_learned and (temperature is None or humidity is None):
+            # The learned MIoT strategy did not answer: try get_prop as well
+            rpc_temp, rpc_humidity = self._read_values_with_rpc(
+                micloud_client, device.did, device.model
+            )
+            if temperature is None:
+                temperature = rpc_temp
+            if humidity is None:
+                humidity = rpc_humidity
+
         return temperature, humidity
 
+    def _learned_miot(self, model: Optional[str]) -> bool:
+        learned = self.strategies.get(model)
+        return learned is not None and learned.startswith("miot:")
+
     def _read_values_with_rpc(
-        self, micloud_client: Any, did: str
+        self, micloud_client: Any, did: str, model: Optional[str] = None
     ) -> Tuple[Optional[float], Optional[float]]:
         endpoint = f"/home/rpc/{did}"
-        for temp_key, hum_key in RPC_PROPERTY_QUERIES:
-            payload = {
-                "id": 1,
-                "method": "get_prop",
-                "params": [temp_key, hum_key],
-            }
-            response = self._request_json(
-                micloud_client=micloud_client, endpoint=endpoint, payload=payload
-            )
-            if response is None:
-                continue
+        learned = self.strategies.get(model)
+        for query in _learned_first(RPC_PROPERTY_QUERIES, _rpc_strategy, learned):
+            values = self._query_rpc(micloud_client, endpoint, query)
+            if values is not None:
+                self.strategies.record(model, _rpc_strategy(query))
+                return values
 
-            result = response.get("result")
-            if isinstance(result, list):
-                temp = _normalize_temperature(result[0] if len(result) > 0 else None)
-                humidity = _normalize_humidity(result[1] if len(result) > 1 else None)
-                if temp is not None or humidity is not None:
-                    return temp, humidity
+        return None, None
 
-            if isinstance(result, dict):
-                temp, humidity = self._extract_raw_values(result)
-                normalized_temp = _normalize_temperature(temp)
-                normalized_humidity = _normalize_humidity(humidity)
-                if normalized_temp is not None or normalized_humidity is not None:
-                    return normalized_temp, normalized_humidity
+    def _query_rpc(
+        self, micloud_client: Any, endpoint: str, query: Tuple[str, str]
+    ) -> Optional[Tuple[Optional[float], Optional[float]]]:
+        """One get_prop call; None unless it returned a temperature or a humidity."""
+        payload = {
+            "id": 1,
+            "method": "get_prop",
+            "params": list(query),
+        }
+        response = self._request_json(
+            micloud_client=micloud_client, endpoint=endpoint, payload=payload
+        )
+        if response is None:
+            return None
 
-        return None, None
+        result = response.get("result")
+        if isinstance(result, list):
+            temp = _normalize_temperature(result[0] if len(result) > 0 else None)
+            humidity = _normalize_humidity(result[1] if len(result) > 1 else None)
+            if temp is not None or humidity is not None:
+                return temp, humidity
+
+        if isinstance(result, dict):
+            temp, humidity = self._extract_raw_values(result)
+            normalized_temp = _normalize_temperature(temp)
+            normalized_humidity = _normalize_humidity(humidity)
+            if normalized_temp is not None or normalized_humidity is not None:
+                return normalized_temp, normalized_humidity
+
+        return None
 
     def _read_values_with_miot_spec(
-        self, micloud_client: Any, did: str
+        self, micloud_client: Any, did: str, model: Optional[str] = None
     ) -> Tuple[Optional[float], Optional[float]]:
         endpoint = "/miotspec/prop/get"
-        for (t_siid, t_piid), (h_siid, h_piid) in MIOT_PROPERTY_CANDIDATES:
+        learned = self.strategies.get(model)
+        for candidate in _learned_first(MIOT_PROPERTY_CANDIDATES, _miot_strategy, learned):
+            (t_siid, t_piid), (h_siid, h_piid) = candidate
             payload = {
                 "params": [
                     {"did": did, "siid": t_siid, "piid": t_piid},
@@ -361,29 +798,139 @@ class XiaomiThermoService:
             response = self._request_json(
                 micloud_client=micloud_client, endpoint=endpoint, payload=payload
             )
-            if response is None:
-                continue
+            result = response.get("result") if response is not None else None
+            value_map = (
+                self._miot_value_map(result, default_did=did) if isinstance(result, list) else {}
+            )
+            values = self._pick_miot_values(value_map, did, model, candidates=(candidate,))
+            if values is not None:
+                return values
 
-            result = response.get("result")
-            if not isinstance(result, list):
+        return None, None
+
+    def _read_values_with_miot_spec_bulk(
+        self,
+        micloud_client: Any,
+        dids: List[str],
+        models: Optional[Dict[str, str]] = None,
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+        """
+        MIoT fallback for many devices at once: every candidate property of every
+        device goes into a few /miotspec/prop/get requests of at most
+        miot_batch_size params, and the answers are matched back by did/siid/piid.
+        Devices in a chunk whose request failed or timed out, or whose answer can't
+        be matched back (items without a did, or for properties that were not asked
+        for), are retried one by one, as are devices the answer left out entirely.
+        The requests run on daemon threads like the other reads, bounded by
+        device_timeout each and by deadline overall; devices still unread then are
+        left out of the result.
+        """
+        if not dids:
+            return {}
+
+        models = models or {}
+        if deadline is None:
+            deadline = time.monotonic() + self.refresh_deadline
+        endpoint = "/miotspec/prop/get"
+        params = [
+            {"did": did, "siid": siid, "piid": piid}
+            for did in dids
+            for candidate in MIOT_PROPERTY_CANDIDATES
+            for siid, piid in candidate
+        ]
+        chunks = [
+            params[start:start + self.miot_batch_size]
+            for start in range(0, len(params), self.miot_batch_size)
+        ]
+
+        def request(chunk: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+            return self._request_json(
+                micloud_client=self._thread_client(micloud_client),
+                endpoint=endpoint,
+                payload={"params": chunk},
+            )
+
+        responses = self._run_with_deadline(
+            request, chunks, deadline, lambda chunk: f"MIoT properties of {chunk[0]['did']}..."
+        )
+        value_map: Dict[Tuple[str, int, int], Any] = {}
+        failed = set()
+        for index, chunk in enumerate(chunks):
+            response = responses.get(index)
+            result = response.get("result") if response is not None else None
+            if not isinstance(result, list) or not self._matches_request(chunk, result):
+                failed.update(item["did"] for item in chunk)
                 continue
+            value_map.update(self._miot_value_map(result))
+            answered = {str(item["did"]) for item in result}
+            failed.update(item["did"] for item in chunk if item["did"] not in answered)
 
-            value_map: Dict[Tuple[int, int], Any] = {}
-            for item in result:
-                if not isinstance(item, dict):
-                    continue
-                siid = item.get("siid")
-                piid = item.get("piid")
-                if siid is None or piid is None:
-                    continue
-                value_map[(int(siid), int(piid))] = item.get("value")
+        retry = [did for did in dids if did in failed]
 
-            temp = _normalize_temperature(value_map.get((t_siid, t_piid)))
-            humidity = _normalize_humidity(value_map.get((h_siid, h_piid)))
+        def read_one(did: str) -> Tuple[Optional[float], Optional[float]]:
+            client = self._thread_client(micloud_client)
+            return self._read_values_with_miot_spec(client, did, models.get(did))
+
+        retried = self._run_with_deadline(read_one, retry, deadline, str)
+        values: Dict[str, Tuple[Optional[float], Optional[float]]] = {
+            retry[index]: result for index, result in retried.items()
+        }
+        for did in dids:
+            model = models.get(did)
+            if did in failed:
+                continue
+            learned = self.strategies.get(model)
+            candidates = _learned_first(MIOT_PROPERTY_CANDIDATES, _miot_strategy, learned)
+            values[did] = self._pick_miot_values(value_map, did, model, candidates) or (None, None)
+        return values
+
+    @staticmethod
+    def _matches_request(params: List[Dict[str, Any]], result: List[Any]) -> bool:
+        """Whether every item of a bulk answer names a did/siid/piid that was requested."""
+        requested = {(str(item["did"]), item["siid"], item["piid"]) for item in params}
+        for item in result:
+            if not isinstance(item, dict) or item.get("did") is None:
+                return False
+            try:
+                key = (str(item["did"]), int(item.get("siid")), int(item.get("piid")))
+            except (TypeError, ValueError):
+                return False
+            if key not in requested:
+                return False
+        return True
+
+    def _pick_miot_values(
+        self,
+        value_map: Dict[Tuple[str, int, int], Any],
+        did: str,
+        model: Optional[str],
+        candidates: Iterable[Tuple[Tuple[int, int], Tuple[int, int]]],
+    ) -> Optional[Tuple[Optional[float], Optional[float]]]:
+        """Values of the first candidate that has any, learning it for the model."""
+        for candidate in candidates:
+            (t_siid, t_piid), (h_siid, h_piid) = candidate
+            temp = _normalize_temperature(value_map.get((did, t_siid, t_piid)))
+            humidity = _normalize_humidity(value_map.get((did, h_siid, h_piid)))
             if temp is not None or humidity is not None:
+                self.strategies.record(model, _miot_strategy(candidate))
                 return temp, humidity
+        return None
 
-        return None, None
+    def _miot_value_map(
+        self, result: List[Any], default_did: Optional[str] = None
+    ) -> Dict[Tuple[str, int, int], Any]:
+        value_map: Dict[Tuple[str, int, int], Any] = {}
+        for item in result:
+            if not isinstance(item, dict):
+                continue
+            did = item.get("did", default_did)
+            siid = item.get("siid")
+            piid = item.get("piid")
+            if did is None or siid is None or piid is None:
+                continue
+            value_map[(str(did), int(siid), int(piid))] = item.get("value")
+        return value_map
 
     def _request_json(
         self, micloud_client: Any, endpoint: str, payload: Dict[str, Any]
@@ -392,9 +939,11 @@ class XiaomiThermoService:
         try:
             response = micloud_client.request_country(endpoint, self.country, params)
         except Exception:
-            return None
+            response = None
 
         if response is None:
+            # micloud answers None when the request itself failed, e.g. a rejected token
+            self._session_stale = True
             return None
 
         if isinstance(response, dict):
@@ -464,3 +1013,140 @@ class XiaomiThermoService:
         if isinstance(device.raw_data, dict):
             return device.raw_data
         return {}
+
+
+_shared_service: Optional[XiaomiThermoService] = None
+_shared_service_lock = threading.Lock()
+
+
+def get_service() -> XiaomiThermoService:
+    """Process-wide service built from the environment; its session and caches outlive a request."""
+    global _shared_service
+    with _shared_service_lock:
+        if _shared_service is None:
+            _shared_service = XiaomiThermoService.from_env()
+        return _shared_service
+
+
+class ThermoPoller:
+    """
+    Refreshes the house readings on a background thread and publishes them as an
+    immutable snapshot, so any number of dashboards cost one cloud round trip per
+    interval. Readers get the latest snapshot immediately; when a refresh fails the
+    previous snapshot keeps being served (marked stale) while the poller retries.
+    """
+
+    def __init__(
+        self,
+        service: XiaomiThermoService,
+        interval: float = DEFAULT_POLL_INTERVAL,
+        idle_timeout: float = DEFAULT_POLL_IDLE_TIMEOUT,
+    ):
+        self.service = service
+        self.interval = max(1.0, interval)
+        self.idle_timeout = idle_timeout
+        self._snapshot: Optional[ReadingsSnapshot] = None
+        self.last_error: Optional[Exception] = None
+        self.refreshes = 0
+        self.failures = 0
+        self._refresh_lock = threading.Lock()  # one cloud refresh at a time
+        self._worker = BackgroundWorker("thermo-poller", self._run)
+        self._last_read = time.monotonic()
+
+    @classmethod
+    def from_env(cls, service: XiaomiThermoService) -> "ThermoPoller":
+        return cls(
+            service,
+            interval=_env_float("MIIO_POLL_INTERVAL", DEFAULT_POLL_INTERVAL),
+            idle_timeout=_env_float("MIIO_POLL_IDLE_TIMEOUT", DEFAULT_POLL_IDLE_TIMEOUT),
+        )
+
+    def get(self) -> Tuple[Optional[ReadingsSnapshot], Optional[Exception]]:
+        """
+        Latest snapshot and the error of the last refresh (None if it succeeded).
+        Only blocks while nothing has been published yet.
+        """
+        self._last_read = time.monotonic()
+        self._worker.ensure_started()
+        if self._snapshot is None:
+            self.refresh(max_age=self.interval)
+        return self._snapshot, self.last_error
+
+    def is_stale(self, snapshot: ReadingsSnapshot) -> bool:
+        return self.last_error is not None or snapshot.age() > 2 * self.interval
+
+    def refresh(self, max_age: Optional[float] = None) -> Optional[ReadingsSnapshot]:
+        """
+        Read from the cloud and publish a new snapshot, unless the current one is
+        younger than max_age. On failure the previous snapshot stays published.
+        """
+        with self._refresh_lock:
+            snapshot = self._snapshot
+            if max_age is not None and snapshot is not None and snapshot.age() < max_age:
+                return snapshot
+            try:
+                payload = _keep_last_values(self.service.get_house_readings(), snapshot)
+                snapshot = ReadingsSnapshot.from_payload(payload)
+            except Exception as exc:
+                self.failures += 1
+                self.last_error = exc
+                print(f"Failed to refresh thermometer data from Xiaomi cloud: {exc}")
+                return self._snapshot
+            self._snapshot = snapshot
+            self.last_error = None
+            self.refreshes += 1
+            return snapshot
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._worker.stop(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "running": self._worker.is_running(),
+            "interval": self.interval,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "snapshot_age": round(snapshot.age(), 1) if snapshot is not None else None,
+            "last_error": str(self.last_error) if self.last_error is not None else None,
+        }
+
+    def _run(self) -> None:
+        while time.monotonic() - self._last_read <= self.idle_timeout:
+            # Skips the cloud call when get() has just published the first snapshot
+            self.refresh(max_age=self.interval / 2)
+            if self._worker.wait(self.interval):
+                return
+        # No dashboard open; the next get() starts polling again
+
+
+def _keep_last_values(
+    payload: Dict[str, Any], previous: Optional[ReadingsSnapshot]
+) -> Dict[str, Any]:
+    """Fill the values of devices that could not be read (stale) from the previous snapshot."""
+    if previous is None:
+        return payload
+    last = {item["did"]: item for item in previous.items}
+    items = []
+    for item in payload["items"]:
+        old = last.get(item.get("did"))
+        if item.get("stale") and old is not None:
+            item = dict(item)
+            for key in ("temperature", "humidity"):
+                if item.get(key) is None:
+                    item[key] = old.get(key)
+        items.append(item)
+    return dict(payload, items=items)
+
+
+_shared_poller: Optional[ThermoPoller] = None
+
+
+def get_poller() -> ThermoPoller:
+    """Process-wide poller for the shared service, see get_service()."""
+    global _shared_poller
+    service = get_service()
+    with _shared_service_lock:
+        if _shared_poller is None:
+            _shared_poller = ThermoPoller.from_env(service)
+        return _shared_poller